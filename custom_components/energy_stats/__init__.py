@@ -6,8 +6,12 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 
 from .api import async_setup_api
-from .const import DOMAIN
+from .const import DOMAIN, UPDATE_MODE_EVENT
 from .coordinator import EnergyStatsCoordinator
+from .engine import async_get_engine
+from .journal import journal_path, remove_journal
+from .services import async_setup_services
+from .sessions import SessionStore
 
 _LOGGER = logging.getLogger(__name__)
 PLATFORMS = ["sensor"]
@@ -17,13 +21,22 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up the new integration config entry."""
     _LOGGER.debug("Executing async_setup_entry (__init__)...")
     coordinator = EnergyStatsCoordinator(hass, entry)
-    await coordinator.async_config_entry_first_refresh()
+    # Start from the stored values, inputs may take a while after startup
+    await coordinator.async_load_stored()
+    if coordinator.update_mode == UPDATE_MODE_EVENT:
+        entry.async_on_unload(coordinator.async_track_inputs())
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    async_setup_api(hass, coordinator)
+    async_setup_api(hass)
+    async_setup_services(hass)
+
+    entry.async_create_background_task(
+        hass, coordinator.async_refresh(), "energy_stats first refresh"
+    )
+    entry.async_on_unload(async_get_engine(hass).async_add(coordinator))
 
     _LOGGER.debug("Energy Stats entry set up")
     return True
@@ -36,3 +49,12 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id, None)
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Drop the stored data of a removed config entry."""
+    await async_get_engine(hass).store.async_remove(entry.entry_id)
+    await SessionStore(hass, entry.entry_id).async_remove()
+    await hass.async_add_executor_job(
+        remove_journal, journal_path(hass, entry.entry_id)
+    )
@@ -1,37 +1,386 @@
 """API implementation of Energy Stats integration."""
 
+import asyncio
 import logging
+import math
+import time
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+from functools import wraps
+from http import HTTPStatus
 
-from aiohttp import web
+from aiohttp import hdrs, web
+from homeassistant.const import CONTENT_TYPE_JSON
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.http import HomeAssistantView
+from homeassistant.util import dt as dt_util
 
+from .const import DOMAIN
 from .coordinator import EnergyStatsCoordinator
+from .export import ArrowEncoder, CsvEncoder, async_iter_hours, import_pyarrow
+from .history import HISTORY_CAPACITY, downsample_lttb
+from .sessions import session_dict
+from .stream import snapshot_event
 
 _LOGGER = logging.getLogger(__name__)
 
+HISTORY_DEFAULT_POINTS = 500
+SESSIONS_DEFAULT_LIMIT = 100
+SESSIONS_MAX_LIMIT = 1000
+# Seconds without updates after which a comment keeps streams open
+STREAM_KEEPALIVE = 30
+# Start of the exported hours when the requested range was truncated
+EXPORT_TRUNCATED_HEADER = "X-Energy-Stats-Truncated-Start"
 
-class EnergyStatsAPI(HomeAssistantView):
+DATA_VIEWS = f"{DOMAIN}_views"
+
+Handler = Callable[
+    ["EnergyStatsView", web.Request, EnergyStatsCoordinator],
+    Awaitable[web.StreamResponse],
+]
+
+
+def instrumented(handler: Handler) -> Callable[..., Awaitable[web.StreamResponse]]:
+    """
+    Resolve the config entry of a request and record the request.
+
+    Count and duration are recorded if the entry has metrics enabled.
+    """
+
+    @wraps(handler)
+    async def wrapper(
+        view: "EnergyStatsView", request: web.Request
+    ) -> web.StreamResponse:
+        coordinator = view.coordinator_for(request)
+        if coordinator is None:
+            return view.json_message("Unknown entry", HTTPStatus.NOT_FOUND)
+        metrics = coordinator.metrics
+        if metrics is None:
+            return await handler(view, request, coordinator)
+        started = time.perf_counter()
+        try:
+            return await handler(view, request, coordinator)
+        finally:
+            metrics.observe_request(view.name, time.perf_counter() - started)
+
+    return wrapper
+
+
+class EnergyStatsView(HomeAssistantView):
+    """
+    Base class of the views, shared by all config entries.
+
+    The entry is selected with the ``entry_id`` query parameter and defaults
+    to the first one.
+    """
+
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize API functionality for all config entries."""
+        self.hass = hass
+
+    def coordinator_for(self, request: web.Request) -> EnergyStatsCoordinator | None:
+        """Return the coordinator of the requested config entry."""
+        coordinators = self.hass.data.get(DOMAIN) or {}
+        entry_id = request.query.get("entry_id")
+        if entry_id is not None:
+            return coordinators.get(entry_id)
+        return next(iter(coordinators.values()), None)
+
+
+class EnergyStatsAPI(EnergyStatsView):
     """API handling class for Energy Stats integration."""
 
     url = "/api/energy_stats"
     name = "api:energy_stats"
-    requires_auth = True
 
-    def __init__(self, coordinator: EnergyStatsCoordinator) -> None:
-        """Initialize API functionality with provided coordinator."""
-        self.coordinator = coordinator
+    @instrumented
+    async def get(
+        self, request: web.Request, coordinator: EnergyStatsCoordinator
+    ) -> web.Response:
+        """
+        Handle the API get requests.
+
+        Supports ``If-None-Match`` with the returned ``ETag`` and a ``since``
+        query parameter with the ``version`` of an earlier delta response, which
+        returns only the values changed since then, or all values with ``full``
+        set if that version is from before a restart.
+        """
+        snapshot = coordinator.snapshot
+        headers = {hdrs.ETAG: snapshot.etag}
+
+        if_none_match = request.headers.get(hdrs.IF_NONE_MATCH)
+        if if_none_match and snapshot.etag in (
+            tag.strip() for tag in if_none_match.split(",")
+        ):
+            return web.Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+        if "since" in request.query:
+            try:
+                changes = snapshot.changes_since_token(request.query["since"])
+            except ValueError:
+                return self.json_message("Invalid since", HTTPStatus.BAD_REQUEST)
+            return self.json(changes, headers=headers)
+
+        return web.Response(
+            body=snapshot.body, content_type=CONTENT_TYPE_JSON, headers=headers
+        )
+
+
+class EnergyStatsHistoryAPI(EnergyStatsView):
+    """API class returning downsampled intraday series."""
+
+    url = "/api/energy_stats/history"
+    name = "api:energy_stats:history"
+
+    @instrumented
+    async def get(
+        self, request: web.Request, coordinator: EnergyStatsCoordinator
+    ) -> web.Response:
+        """
+        Handle the API get requests.
+
+        Query parameters: ``keys`` (comma separated, default all), ``start`` and
+        ``end`` (ISO datetimes, default the last 24 hours) and ``points`` (the
+        maximum number of points per series).
+        """
+        query = request.query
+        end = dt_util.utcnow()
+        if "end" in query:
+            end = dt_util.parse_datetime(query["end"])
+        start = end - timedelta(days=1) if end else None
+        if "start" in query:
+            start = dt_util.parse_datetime(query["start"])
+        if start is None or end is None:
+            return self.json_message("Invalid start or end", HTTPStatus.BAD_REQUEST)
+
+        try:
+            points = int(query.get("points", HISTORY_DEFAULT_POINTS))
+        except ValueError:
+            return self.json_message("Invalid points", HTTPStatus.BAD_REQUEST)
+        points = max(3, min(points, HISTORY_CAPACITY))
+
+        history = coordinator.history
+        keys = query["keys"].split(",") if "keys" in query else list(history)
+
+        series = {}
+        for key in keys:
+            buffer = history.get(key)
+            if buffer is None:
+                continue
+            times, values = buffer.range(start.timestamp(), end.timestamp())
+            times, values = downsample_lttb(times, values, points)
+            series[key] = {"t": times, "v": values}
+
+        return self.json(
+            {"start": start.isoformat(), "end": end.isoformat(), "series": series}
+        )
+
+
+class EnergyStatsRollupsAPI(EnergyStatsView):
+    """API class returning the hourly, weekly, monthly and yearly rollups."""
+
+    url = "/api/energy_stats/rollups"
+    name = "api:energy_stats:rollups"
+
+    @instrumented
+    async def get(
+        self, _request: web.Request, coordinator: EnergyStatsCoordinator
+    ) -> web.Response:
+        """
+        Handle the API get requests.
+
+        Returns the energies and ratios of every hour of the current day and
+        of the current and the previous week, month and year.
+        """
+        return self.json(coordinator.rollup_report())
+
+
+class EnergyStatsSessionsAPI(EnergyStatsView):
+    """API class returning the recorded car charging sessions."""
+
+    url = "/api/energy_stats/sessions"
+    name = "api:energy_stats:sessions"
+
+    @instrumented
+    async def get(
+        self, request: web.Request, coordinator: EnergyStatsCoordinator
+    ) -> web.Response:
+        """
+        Handle the API get requests.
+
+        Query parameters: ``start`` and ``end`` (ISO datetimes, sessions
+        starting in between, default all), ``offset`` and ``limit`` (the page,
+        default the first SESSIONS_DEFAULT_LIMIT sessions). The running session
+        is returned as ``active``.
+        """
+        query = request.query
+        start = end = None
+        if (
+            "start" in query
+            and (start := dt_util.parse_datetime(query["start"])) is None
+        ):
+            return self.json_message("Invalid start", HTTPStatus.BAD_REQUEST)
+        if "end" in query and (end := dt_util.parse_datetime(query["end"])) is None:
+            return self.json_message("Invalid end", HTTPStatus.BAD_REQUEST)
+        try:
+            offset = max(0, int(query.get("offset", 0)))
+            limit = int(query.get("limit", SESSIONS_DEFAULT_LIMIT))
+        except ValueError:
+            return self.json_message("Invalid offset or limit", HTTPStatus.BAD_REQUEST)
+        limit = max(1, min(limit, SESSIONS_MAX_LIMIT))
+
+        records, total = coordinator.session_store.query(
+            start.timestamp() if start else -math.inf,
+            end.timestamp() if end else math.inf,
+            offset,
+            limit,
+        )
+        active = coordinator.current_session()
+        return self.json(
+            {
+                "sessions": [session_dict(record) for record in records],
+                "total": total,
+                "offset": offset,
+                "next_offset": (offset + limit if offset + limit < total else None),
+                "active": session_dict(active) if active else None,
+            }
+        )
+
+
+class EnergyStatsExportAPI(EnergyStatsView):
+    """API class streaming the hourly buckets of a range for bulk export."""
+
+    url = "/api/energy_stats/export"
+    name = "api:energy_stats:export"
+
+    @instrumented
+    async def get(
+        self, request: web.Request, coordinator: EnergyStatsCoordinator
+    ) -> web.StreamResponse:
+        """
+        Handle the API get requests.
+
+        Query parameters: ``start`` and ``end`` (ISO datetimes, default the
+        last 24 hours) and ``format`` (``csv`` or ``arrow``, default csv).
+        Every row holds the energies, flows and ratios of one hour. The rows
+        are encoded and written one chunk at a time, so the response is never
+        held in memory as a whole. Without long-term statistics only the
+        running day is exported, and a header tells where the exported range starts.
+        """
+        query = request.query
+        end = dt_util.utcnow()
+        if "end" in query:
+            end = dt_util.parse_datetime(query["end"])
+        start = end - timedelta(days=1) if end else None
+        if "start" in query:
+            start = dt_util.parse_datetime(query["start"])
+        if start is None or end is None:
+            return self.json_message("Invalid start or end", HTTPStatus.BAD_REQUEST)
+
+        export_format = query.get("format", "csv")
+        if export_format == "csv":
+            encoder = CsvEncoder(coordinator.hour_keys)
+        elif export_format == "arrow":
+            pyarrow = await self.hass.async_add_import_executor_job(import_pyarrow)
+            if pyarrow is None:
+                return self.json_message(
+                    "Arrow export requires pyarrow", HTTPStatus.BAD_REQUEST
+                )
+            encoder = ArrowEncoder(pyarrow, coordinator.hour_keys)
+        else:
+            return self.json_message("Invalid format", HTTPStatus.BAD_REQUEST)
+
+        headers = {
+            hdrs.CONTENT_TYPE: encoder.content_type,
+            hdrs.CONTENT_DISPOSITION: (
+                f'attachment; filename="energy_stats.{encoder.extension}"'
+            ),
+        }
+        statistic_ids, _ = coordinator.imported_statistics()
+        day_start = coordinator.day_start()
+        if not statistic_ids and start < day_start:
+            headers[EXPORT_TRUNCATED_HEADER] = day_start.isoformat()
+        response = web.StreamResponse(headers=headers)
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        try:
+            await response.write(encoder.header())
+            async for rows in async_iter_hours(coordinator, start, end):
+                await response.write(
+                    encoder.encode(
+                        [
+                            (hour_id, coordinator.hour_values(energies))
+                            for hour_id, energies in rows
+                        ]
+                    )
+                )
+            await response.write(encoder.footer())
+        except ConnectionResetError:
+            _LOGGER.debug("Export client disconnected")
+        return response
+
+
+class EnergyStatsStreamAPI(EnergyStatsView):
+    """API class streaming the values as server-sent events."""
+
+    url = "/api/energy_stats/stream"
+    name = "api:energy_stats:stream"
+
+    async def get(self, request: web.Request) -> web.StreamResponse:
+        """
+        Handle the API get requests.
+
+        Sends a ``snapshot`` event with all values, followed by a ``delta``
+        event with the changed values and removed keys per update. Streams stay
+        open, so only the time until the response starts is recorded.
+        """
+        started = time.perf_counter()
+        coordinator = self.coordinator_for(request)
+        if coordinator is None:
+            return self.json_message("Unknown entry", HTTPStatus.NOT_FOUND)
+        response = web.StreamResponse(
+            headers={
+                hdrs.CONTENT_TYPE: "text/event-stream",
+                hdrs.CACHE_CONTROL: "no-cache",
+            }
+        )
+        await response.prepare(request)
+        if coordinator.metrics is not None:
+            coordinator.metrics.observe_request(
+                self.name, time.perf_counter() - started
+            )
 
-    async def get(self, _request) -> web.Response:  # noqa: ANN001
-        """Handle the API get requests."""
-        data = self.coordinator.data
-        if "calculated_keys" in data:
-            data.pop("calculated_keys")
-        _LOGGER.debug("Returning data: %s", str(data))
-        return web.json_response(data)
+        stream = coordinator.stream
+        subscriber = stream.subscribe()
+        try:
+            event = None
+            while not subscriber.closed:
+                if event is None:
+                    event = snapshot_event(coordinator.snapshot)
+                await response.write(event)
+                try:
+                    async with asyncio.timeout(STREAM_KEEPALIVE):
+                        event = await subscriber.get()
+                except TimeoutError:
+                    event = b": keepalive\n\n"
+        except ConnectionResetError:
+            _LOGGER.debug("Stream client disconnected")
+        finally:
+            stream.unsubscribe(subscriber)
+        return response
 
 
-def async_setup_api(hass: HomeAssistant, coordinator: EnergyStatsCoordinator) -> None:
-    """Set up the API."""
+def async_setup_api(hass: HomeAssistant) -> None:
+    """Set up the API once for all config entries."""
+    if DATA_VIEWS in hass.data:
+        return
     _LOGGER.debug("Executing async_setup_api...")
-    hass.http.register_view(EnergyStatsAPI(coordinator))
+    hass.data[DATA_VIEWS] = True
+    hass.http.register_view(EnergyStatsAPI(hass))
+    hass.http.register_view(EnergyStatsHistoryAPI(hass))
+    hass.http.register_view(EnergyStatsRollupsAPI(hass))
+    hass.http.register_view(EnergyStatsSessionsAPI(hass))
+    hass.http.register_view(EnergyStatsExportAPI(hass))
+    hass.http.register_view(EnergyStatsStreamAPI(hass))
@@ -0,0 +1,100 @@
+"""Backfill of missed intervals from recorder statistics."""
+
+import math
+from array import array
+from datetime import UTC, datetime, timedelta
+
+from homeassistant.components.recorder.statistics import statistics_during_period
+from homeassistant.const import UnitOfPower
+from homeassistant.core import HomeAssistant
+
+from .calculations import hourly_energies
+
+# Length of a short-term statistics row
+STATISTICS_PERIOD = timedelta(minutes=5)
+# Time after the end of a period until the recorder has compiled its rows
+STATISTICS_COMPILE_DELAY = timedelta(minutes=1)
+
+# Power roles that are read from the statistics
+POWER_KEYS = ("grid_power", "pv_power", "battery_power", "car_charging_power")
+
+# Daily energy key -> (energy role, power role, sign) of power-only integration
+POWER_ENERGY_KEYS = {
+    "grid_in_energy_daily": ("grid_in_energy", "grid_power", 1),
+    "grid_out_energy_daily": ("grid_out_energy", "grid_power", -1),
+    "pv_energy_daily": ("pv_energy", "pv_power", 1),
+    "car_charging_energy": ("car_charging_energy", "car_charging_power", 1),
+}
+
+
+def compiled_until(now: datetime) -> datetime:
+    """Return the end of the last short-term statistics period compiled by now."""
+    period = STATISTICS_PERIOD.total_seconds()
+    timestamp = (now - STATISTICS_COMPILE_DELAY).timestamp()
+    return datetime.fromtimestamp(timestamp - timestamp % period, tz=UTC)
+
+
+def hourly_from_statistics(
+    hass: HomeAssistant,
+    start: datetime,
+    end: datetime,
+    sensors: dict[str, list[str]],
+    scales: dict[str, float],
+) -> dict[int, dict[str, float]]:
+    """
+    Integrate the short-term statistics of the power entities per hour.
+
+    Runs in the recorder executor. All power entities are fetched in one
+    query and converted to W by the recorder. The scaled means of the
+    entities of a role are summed like the live update does, and the
+    columns are integrated by calculations.hourly_energies.
+    """
+    entity_ids = {key: sensors[key] for key in POWER_KEYS if sensors.get(key)}
+    if not entity_ids:
+        return {}
+
+    stats = statistics_during_period(
+        hass,
+        start - STATISTICS_PERIOD,
+        end,
+        {entity_id for ids in entity_ids.values() for entity_id in ids},
+        "5minute",
+        {"power": UnitOfPower.WATT},
+        {"mean"},
+    )
+
+    # Align the rows of all entities on their start timestamps
+    starts = sorted({row["start"] for rows in stats.values() for row in rows})
+    index = {row_start: pos for pos, row_start in enumerate(starts)}
+    columns = {}
+    for key, ids in entity_ids.items():
+        column = array("d", [math.nan]) * len(starts)
+        for entity_id in ids:
+            scale = float(scales.get(entity_id, 1.0))
+            for row in stats.get(entity_id, ()):
+                if row.get("mean") is None:
+                    continue
+                pos = index[row["start"]]
+                power = row["mean"] * scale
+                column[pos] = power if math.isnan(column[pos]) else column[pos] + power
+        columns[key] = column
+
+    # Hours of each row within the gap
+    period = STATISTICS_PERIOD.total_seconds()
+    start_ts = start.timestamp()
+    end_ts = end.timestamp()
+    durations = array(
+        "d",
+        (
+            max(0.0, min(row_start + period, end_ts) - max(row_start, start_ts))
+            / 3600.0
+            for row_start in starts
+        ),
+    )
+
+    power_only = {
+        key: (power_key, sign)
+        for key, (energy_key, power_key, sign) in POWER_ENERGY_KEYS.items()
+        if not sensors.get(energy_key) and power_key in columns
+    }
+    return hourly_energies(starts, durations, columns, power_only)
@@ -0,0 +1,144 @@
+"""
+Pure energy calculations for Energy Stats integration.
+
+Nothing here has side effects or depends on Home Assistant. The per-update
+helpers take one sample and cost O(1), the batch helpers take aligned
+columns of samples and run in an executor, e.g. for a backfill or a
+recomputation.
+"""
+
+import math
+from collections.abc import Sequence
+
+FLOW_SOURCES = ("pv", "grid", "battery")
+FLOW_SINKS = ("home", "car", "battery", "grid")
+# Cells of the source -> sink matrix, named "<source>_<sink>"
+FLOW_CELLS = tuple(
+    f"{source}_{sink}"
+    for source in FLOW_SOURCES
+    for sink in FLOW_SINKS
+    if source != sink
+)
+
+
+def allocate_flows(
+    pv_power: float | None,
+    grid_power: float | None,
+    battery_power: float | None = None,
+    car_power: float | None = None,
+) -> dict[str, float]:
+    """
+    Allocate the momentary powers of the sources to the sinks.
+
+    Grid power is positive while importing and battery power positive while
+    discharging. The home gets what is left of the balance. Export is fed by
+    PV first and by the battery second, battery charging by PV first and by
+    the grid second, and home and car share the remaining supply in
+    proportion to their demand.
+    """
+    pv = max(0.0, pv_power or 0.0)
+    grid = grid_power or 0.0
+    battery = battery_power or 0.0
+    imported = max(0.0, grid)
+    exported = max(0.0, -grid)
+    discharge = max(0.0, battery)
+    charge = max(0.0, -battery)
+
+    flows = dict.fromkeys(FLOW_CELLS, 0.0)
+    flows["pv_grid"] = pv_export = min(pv, exported)
+    flows["battery_grid"] = battery_export = min(discharge, exported - pv_export)
+    flows["pv_battery"] = pv_charge = min(pv - pv_export, charge)
+    flows["grid_battery"] = grid_charge = min(imported, charge - pv_charge)
+
+    left = {
+        "pv": pv - pv_export - pv_charge,
+        "grid": imported - grid_charge,
+        "battery": discharge - battery_export,
+    }
+    supply = left["pv"] + left["grid"] + left["battery"]
+    if supply <= 0:
+        return flows
+
+    car = min(max(0.0, car_power or 0.0), supply)
+    for source, power in left.items():
+        share = power / supply
+        flows[f"{source}_car"] = car * share
+        flows[f"{source}_home"] = (supply - car) * share
+    return flows
+
+
+def trapezoid(
+    last_power: float, power: float, elapsed_h: float, *, step: bool = False
+) -> float:
+    """
+    Return the energy (Wh) between two power samples (W) of an interval.
+
+    With ``step`` the power is a step function that held the last sample until
+    the new one, like inputs that only report their changes.
+    """
+    if elapsed_h <= 0:
+        return 0.0
+    if step:
+        return last_power * elapsed_h
+    return (last_power + power) / 2 * elapsed_h
+
+
+def hourly_energies(
+    starts: Sequence[float],
+    durations: Sequence[float],
+    columns: dict[str, Sequence[float]],
+    power_only: dict[str, tuple[str, int]],
+) -> dict[int, dict[str, float]]:
+    """
+    Integrate aligned mean power columns into the energies of every hour.
+
+    ``columns`` hold the mean power (W) of each role per row, NaN where it
+    is missing, ``starts`` the start timestamp and ``durations`` the length
+    in hours of each row, which must not span an hour boundary.
+    ``power_only`` maps the energy keys that are integrated from a power role
+    to that role and its sign. Returns the energies and flow cells (Wh) per
+    hour counted since the Unix epoch, like the rollups.
+    """
+    count = len(durations)
+    nan_column = [math.nan] * count
+    grid = columns.get("grid_power", nan_column)
+    pv = columns.get("pv_power", nan_column)
+    battery = columns.get("battery_power", nan_column)
+    car = columns.get("car_charging_power", nan_column)
+    power_columns = [
+        (key, columns[role], sign) for key, (role, sign) in power_only.items()
+    ]
+
+    hours: dict[int, dict[str, float]] = {}
+    for pos in range(count):
+        duration = durations[pos]
+        if duration <= 0:
+            continue
+        energies = hours.setdefault(int(starts[pos] // 3600), {})
+        for key, column, sign in power_columns:
+            power = sign * column[pos]
+            if power > 0:
+                energies[key] = energies.get(key, 0.0) + power * duration
+
+        grid_power = grid[pos]
+        if math.isnan(grid_power):
+            continue
+        flows = allocate_flows(
+            None if math.isnan(pv[pos]) else pv[pos],
+            grid_power,
+            None if math.isnan(battery[pos]) else battery[pos],
+            None if math.isnan(car[pos]) else car[pos],
+        )
+        for cell, power in flows.items():
+            if power > 0:
+                energies[cell] = energies.get(cell, 0.0) + power * duration
+    return {hour_id: energies for hour_id, energies in hours.items() if energies}
+
+
+def sum_hours(hours: dict[int, dict[str, float]]) -> dict[str, float]:
+    """Return the energies of a range of hours summed per key."""
+    totals: dict[str, float] = {}
+    for energies in hours.values():
+        for key, value in energies.items():
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
@@ -7,17 +7,44 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.helpers import selector
 
-from .const import CONF_DAILY_RESET, DOMAIN, SENSOR_KEYS
+from .const import (
+    CONF_COSTS,
+    CONF_DAILY_RESET,
+    CONF_FLUSH_INTERVAL,
+    CONF_INSTRUMENTATION,
+    CONF_JOURNAL,
+    CONF_MAX_ERROR,
+    CONF_MAX_INTERVAL,
+    CONF_MAX_STALENESS,
+    CONF_MIN_INTERVAL,
+    CONF_SOURCE_BREAKDOWN,
+    CONF_SOURCE_SCALES,
+    CONF_STATISTICS,
+    CONF_UPDATE_MODE,
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_MAX_ERROR,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MAX_STALENESS,
+    DEFAULT_MIN_INTERVAL,
+    DOMAIN,
+    SENSOR_KEYS,
+    UPDATE_MODE_POLLING,
+    UPDATE_MODES,
+)
+from .sources import MULTI_SOURCE_KINDS, entity_ids
 
 _LOGGER = logging.getLogger(__name__)
 
+# Entity ID -> factor, see sources.SourceAggregator
+SOURCE_SCALES_SCHEMA = vol.Schema({str: vol.Coerce(float)})
+
 
 class EnergyStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow class for Energy Stats integration."""
 
     VERSION = 1
 
-    async def async_step_user(
+    async def async_step_user(  # noqa: PLR0912, PLR0915
         self, user_input: dict[str, vol.Any] | None = None
     ) -> config_entries.ConfigFlowResult:
         """Execute main configuraton step."""
@@ -28,14 +55,31 @@ class EnergyStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             data = {k: user_input.get(k) for k in SENSOR_KEYS}
 
             data[CONF_DAILY_RESET] = user_input.get(CONF_DAILY_RESET)  # type: ignore  # noqa: PGH003
+            data[CONF_UPDATE_MODE] = user_input.get(CONF_UPDATE_MODE)  # type: ignore  # noqa: PGH003
+            data[CONF_MIN_INTERVAL] = user_input.get(CONF_MIN_INTERVAL)  # type: ignore  # noqa: PGH003
+            data[CONF_MAX_INTERVAL] = user_input.get(CONF_MAX_INTERVAL)  # type: ignore  # noqa: PGH003
+            data[CONF_MAX_ERROR] = user_input.get(CONF_MAX_ERROR)  # type: ignore  # noqa: PGH003
+            data[CONF_FLUSH_INTERVAL] = user_input.get(CONF_FLUSH_INTERVAL)  # type: ignore  # noqa: PGH003
+            data[CONF_MAX_STALENESS] = user_input.get(CONF_MAX_STALENESS)  # type: ignore  # noqa: PGH003
+            data[CONF_JOURNAL] = user_input.get(CONF_JOURNAL, False)  # type: ignore  # noqa: PGH003
+            data[CONF_INSTRUMENTATION] = user_input.get(CONF_INSTRUMENTATION, False)  # type: ignore  # noqa: PGH003
+            data[CONF_STATISTICS] = user_input.get(CONF_STATISTICS, False)  # type: ignore  # noqa: PGH003
+            data[CONF_SOURCE_BREAKDOWN] = user_input.get(CONF_SOURCE_BREAKDOWN, False)  # type: ignore  # noqa: PGH003
+            data[CONF_COSTS] = user_input.get(CONF_COSTS, False)  # type: ignore  # noqa: PGH003
+            try:
+                data[CONF_SOURCE_SCALES] = SOURCE_SCALES_SCHEMA(
+                    user_input.get(CONF_SOURCE_SCALES) or {}
+                )
+            except vol.Invalid:
+                errors[CONF_SOURCE_SCALES] = "invalid_scales"
 
-            if self.source == config_entries.SOURCE_RECONFIGURE:
+            if not errors and self.source == config_entries.SOURCE_RECONFIGURE:
                 entry = self._get_reconfigure_entry()
                 self.hass.config_entries.async_update_entry(entry, data=data)
                 await self.hass.config_entries.async_reload(entry.entry_id)
                 return self.async_abort(reason="Reconfigured!")
-
-            return self.async_create_entry(title="Energy Stats", data=data)
+            if not errors:
+                return self.async_create_entry(title="Energy Stats", data=data)
 
         schema_dict = {}
 
@@ -43,6 +87,9 @@ class EnergyStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if self.source == config_entries.SOURCE_RECONFIGURE:
             entry = self._get_reconfigure_entry()
         defaults = entry.data if entry else {}
+        if errors:
+            # Show the rejected input again
+            defaults = user_input
 
         # Daily reset time
         try:
@@ -63,29 +110,117 @@ class EnergyStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
         ] = selector.TimeSelector()
 
+        schema_dict[
+            vol.Required(
+                CONF_UPDATE_MODE,
+                default=defaults.get(CONF_UPDATE_MODE) or UPDATE_MODE_POLLING,
+            )
+        ] = selector.SelectSelector(
+            selector.SelectSelectorConfig(
+                options=UPDATE_MODES,
+                translation_key=CONF_UPDATE_MODE,
+            )
+        )
+
+        for key, default, maximum, unit in (
+            (CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL, 60, "s"),
+            (CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL, 3600, "s"),
+            (CONF_MAX_ERROR, DEFAULT_MAX_ERROR, 1000, "Wh/h"),
+        ):
+            schema_dict[vol.Required(key, default=defaults.get(key, default))] = (
+                selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0.1 if key == CONF_MAX_ERROR else 1,
+                        max=maximum,
+                        step="any" if key == CONF_MAX_ERROR else 1,
+                        unit_of_measurement=unit,
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                )
+            )
+
+        schema_dict[
+            vol.Required(
+                CONF_FLUSH_INTERVAL,
+                default=defaults.get(CONF_FLUSH_INTERVAL, DEFAULT_FLUSH_INTERVAL),
+            )
+        ] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=0,
+                max=3600,
+                step=1,
+                unit_of_measurement="s",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+
+        schema_dict[
+            vol.Required(
+                CONF_MAX_STALENESS,
+                default=defaults.get(CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS),
+            )
+        ] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=0,
+                max=3600,
+                step=1,
+                unit_of_measurement="s",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+
+        schema_dict[
+            vol.Required(CONF_JOURNAL, default=defaults.get(CONF_JOURNAL, False))
+        ] = selector.BooleanSelector()
+
+        schema_dict[
+            vol.Required(
+                CONF_INSTRUMENTATION, default=defaults.get(CONF_INSTRUMENTATION, False)
+            )
+        ] = selector.BooleanSelector()
+
+        schema_dict[
+            vol.Required(CONF_STATISTICS, default=defaults.get(CONF_STATISTICS, False))
+        ] = selector.BooleanSelector()
+
         for key, params in SENSOR_KEYS.items():
+            # Power and energy roles accept several entities that are summed
+            multiple = params[0] in MULTI_SOURCE_KINDS
+            suggested = entity_ids(defaults.get(key)) if multiple else defaults.get(key)
             vol_key = None
             if params[1] == "optional":
-                vol_key = vol.Optional(
-                    key, description={"suggested_value": defaults.get(key)}
-                )
+                vol_key = vol.Optional(key, description={"suggested_value": suggested})
             else:
-                vol_key = vol.Required(
-                    key, description={"suggested_value": defaults.get(key)}
-                )
-
+                vol_key = vol.Required(key, description={"suggested_value": suggested})
+
+            entity_filter = {
+                "domain": "binary_sensor" if (params[0] == "plug") else "sensor",
+                "device_class": params[0],
+            }
+            if params[0] == "price":
+                # Price sensors rarely have a device class, e.g. EUR/kWh
+                entity_filter = {"domain": ["sensor", "input_number"]}
             schema_dict[vol_key] = selector.selector(
-                {
-                    "entity": {
-                        "filter": {
-                            "domain": (
-                                "binary_sensor" if (params[0] == "plug") else "sensor"
-                            ),
-                            "device_class": params[0],
-                        }
-                    }
-                }
+                {"entity": {"multiple": multiple, "filter": entity_filter}}
+            )
+
+        schema_dict[
+            vol.Optional(
+                CONF_SOURCE_SCALES,
+                description={"suggested_value": defaults.get(CONF_SOURCE_SCALES)},
             )
+        ] = selector.ObjectSelector()
+
+        schema_dict[
+            vol.Required(
+                CONF_SOURCE_BREAKDOWN,
+                default=defaults.get(CONF_SOURCE_BREAKDOWN, False),
+            )
+        ] = selector.BooleanSelector()
+
+        schema_dict[
+            vol.Required(CONF_COSTS, default=defaults.get(CONF_COSTS, False))
+        ] = selector.BooleanSelector()
 
         data_schema = vol.Schema(schema_dict)
 
@@ -2,6 +2,48 @@
 
 DOMAIN = "energy_stats"
 CONF_DAILY_RESET = "daily_reset_time"
+CONF_UPDATE_MODE = "update_mode"
+CONF_FLUSH_INTERVAL = "flush_interval"
+CONF_JOURNAL = "journal"
+CONF_INSTRUMENTATION = "instrumentation"
+CONF_MIN_INTERVAL = "min_interval"
+CONF_MAX_INTERVAL = "max_interval"
+CONF_MAX_ERROR = "max_error"
+CONF_MAX_STALENESS = "max_staleness"
+CONF_STATISTICS = "statistics"
+CONF_SOURCE_SCALES = "source_scales"
+CONF_SOURCE_BREAKDOWN = "source_breakdown"
+CONF_COSTS = "costs"
+
+# Seconds between writes of changed data, i.e. the maximum loss on a crash
+DEFAULT_FLUSH_INTERVAL = 60
+
+# Polling re-reads all inputs on a fixed interval, adaptive polling adjusts
+# the interval to the input changes, event mode integrates between
+# consecutive state changes of the configured inputs
+UPDATE_MODE_POLLING = "polling"
+UPDATE_MODE_ADAPTIVE = "adaptive"
+UPDATE_MODE_EVENT = "event"
+UPDATE_MODES = [UPDATE_MODE_POLLING, UPDATE_MODE_ADAPTIVE, UPDATE_MODE_EVENT]
+
+# Bounds of the adaptive interval (seconds) and of its integration error
+# (Wh per hour), see scheduler.py
+DEFAULT_MIN_INTERVAL = 1
+DEFAULT_MAX_INTERVAL = 60
+DEFAULT_MAX_ERROR = 20
+
+# Seconds a sensor may show an outdated value before it writes its state
+DEFAULT_MAX_STALENESS = 300
+
+# Device class -> (absolute, relative) change needed before a sensor writes
+# its state earlier, the larger of both applies; None are the ratios
+WRITE_THRESHOLDS: dict[str | None, tuple[float, float]] = {
+    "energy": (1.0, 0.0001),
+    "monetary": (0.01, 0.0),
+    None: (0.001, 0.0),
+}
+# Relative change from which the instrumentation sensors are written
+METRIC_WRITE_THRESHOLD = (0.0, 0.1)
 
 # Die Keys, die im ConfigFlow als auswählbare Sensoren auftauchen
 SENSOR_KEYS = {
@@ -17,6 +59,8 @@ SENSOR_KEYS = {
     "car_charging_energy": ["energy", "optional"],
     "car_connected": ["plug", "optional"],
     "car_soc": ["battery", "optional"],
+    "import_price": ["price", "optional"],
+    "export_price": ["price", "optional"],
 }
 
 CALCULATED_VALUES = {
@@ -24,12 +68,94 @@ CALCULATED_VALUES = {
     "grid_out_energy_daily": ["Daily Fed-In Energy", "energy", "total", "Wh"],
     "pv_energy_daily": ["Daily Generated PV Energy", "energy", "total", "Wh"],
     "home_energy_daily": ["Daily Consumed Home Energy", "energy", "total", "Wh"],
+    "flow_pv_home": ["Daily PV to Home Energy", "energy", "total", "Wh"],
+    "flow_pv_car": ["Daily PV to Car Energy", "energy", "total", "Wh"],
+    "flow_pv_battery": ["Daily PV to Battery Energy", "energy", "total", "Wh"],
+    "flow_pv_grid": ["Daily PV to Grid Energy", "energy", "total", "Wh"],
+    "flow_grid_home": ["Daily Grid to Home Energy", "energy", "total", "Wh"],
+    "flow_grid_car": ["Daily Grid to Car Energy", "energy", "total", "Wh"],
+    "flow_grid_battery": ["Daily Grid to Battery Energy", "energy", "total", "Wh"],
+    "flow_battery_home": ["Daily Battery to Home Energy", "energy", "total", "Wh"],
+    "flow_battery_car": ["Daily Battery to Car Energy", "energy", "total", "Wh"],
+    "flow_battery_grid": ["Daily Battery to Grid Energy", "energy", "total", "Wh"],
     "home_energy_mix_daily": ["Energy Mix Home", None, "measurement", None],
     "battery_energy_mix_daily": ["Energy Mix Battery", None, "measurement", None],
+    "self_consumption_daily": ["Daily PV Self-Consumption", None, "measurement", None],
+    "self_sufficiency_daily": ["Daily Self-Sufficiency", None, "measurement", None],
     "car_charging_energy_mix": [
         "Energy Mix Car Charging (last session)",
         None,
         "measurement",
         None,
     ],
+    # Monetary values are in the currency configured in Home Assistant
+    "grid_in_cost_daily": ["Daily Import Cost", "monetary", "total", None],
+    "grid_out_revenue_daily": ["Daily Feed-In Revenue", "monetary", "total", None],
+    "home_cost_daily": ["Daily Home Energy Cost", "monetary", "total", None],
+    "car_cost_daily": ["Daily Car Charging Cost", "monetary", "total", None],
+    "car_charging_cost": [
+        "Car Charging Cost (last session)",
+        "monetary",
+        "total",
+        None,
+    ],
+}
+
+# Daily key of each energy that is rolled up into weeks, months and years
+ROLLUP_ENERGY_KEYS = {
+    "grid_in_energy": "grid_in_energy_daily",
+    "grid_out_energy": "grid_out_energy_daily",
+    "pv_energy": "pv_energy_daily",
+    "home_energy": "home_energy_daily",
+}
+
+# Daily key of each ratio derived from the energy flows, see flows.FLOW_RATIOS
+RATIO_KEYS = {
+    "home_energy_mix": "home_energy_mix_daily",
+    "battery_energy_mix": "battery_energy_mix_daily",
+    "car_charging_energy_mix": "car_charging_energy_mix",
+    "self_consumption": "self_consumption_daily",
+    "self_sufficiency": "self_sufficiency_daily",
+}
+
+# Rollup period -> suffix of its sensors, see rollups.py
+ROLLUP_PERIODS = {"month": "monthly", "year": "yearly"}
+
+ROLLUP_NAMES = {
+    "grid_in_energy": "Imported Energy",
+    "grid_out_energy": "Fed-In Energy",
+    "pv_energy": "Generated PV Energy",
+    "home_energy": "Consumed Home Energy",
+    "home_energy_mix": "Energy Mix Home",
+    "battery_energy_mix": "Energy Mix Battery",
+    "car_charging_energy_mix": "Energy Mix Car Charging",
+    "self_consumption": "PV Self-Consumption",
+    "self_sufficiency": "Self-Sufficiency",
+}
+
+CALCULATED_VALUES.update(
+    {
+        f"{key}_{suffix}": [
+            f"{suffix.capitalize()} {ROLLUP_NAMES[key]}",
+            *CALCULATED_VALUES[daily_key][1:],
+        ]
+        for keys in (ROLLUP_ENERGY_KEYS, RATIO_KEYS)
+        for key, daily_key in keys.items()
+        for suffix in ROLLUP_PERIODS.values()
+    }
+)
+
+# Diagnostic sensors created with instrumentation enabled, see metrics.py
+METRIC_VALUES = {
+    "update_duration": ["Update Duration", "duration", "measurement", "ms"],
+    "update_duration_p95": [
+        "Update Duration (95th Percentile)",
+        "duration",
+        "measurement",
+        "ms",
+    ],
+    "save_duration": ["Store Save Duration", "duration", "measurement", "ms"],
+    "saved_bytes": ["Store Bytes Written", "data_size", "total_increasing", "B"],
+    "failed_updates": ["Failed Updates", None, "total_increasing", None],
+    "api_requests": ["API Requests", None, "total_increasing", None],
 }
@@ -1,38 +1,147 @@
 """Energy Stats coordinator integration."""
 
+import asyncio
 import logging
-from datetime import UTC, datetime, timedelta
+import secrets
+import time
+from collections.abc import Callable, Mapping
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
 
+from homeassistant.components.recorder import get_instance
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.storage import Store
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    State,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_point_in_utc_time,
+    async_track_state_change_event,
+)
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import dt as dt_util
 
-from .const import CONF_DAILY_RESET, SENSOR_KEYS
+from .backfill import POWER_ENERGY_KEYS, compiled_until, hourly_from_statistics
+from .calculations import FLOW_CELLS, allocate_flows, sum_hours, trapezoid
+from .const import (
+    CALCULATED_VALUES,
+    CONF_COSTS,
+    CONF_DAILY_RESET,
+    CONF_FLUSH_INTERVAL,
+    CONF_INSTRUMENTATION,
+    CONF_JOURNAL,
+    CONF_MAX_ERROR,
+    CONF_MAX_INTERVAL,
+    CONF_MIN_INTERVAL,
+    CONF_SOURCE_BREAKDOWN,
+    CONF_SOURCE_SCALES,
+    CONF_STATISTICS,
+    CONF_UPDATE_MODE,
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_MAX_ERROR,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    RATIO_KEYS,
+    ROLLUP_ENERGY_KEYS,
+    ROLLUP_PERIODS,
+    SENSOR_KEYS,
+    UPDATE_MODE_ADAPTIVE,
+    UPDATE_MODE_EVENT,
+    UPDATE_MODE_POLLING,
+)
+from .engine import async_get_engine
+from .flows import FLOW_RATIOS, FlowMatrix
+from .history import TimeSeriesBuffer
+from .metrics import EnergyStatsMetrics
+from .rollups import (
+    PERIODS,
+    RollupTree,
+    period_label,
+    period_start,
+    reset_after,
+)
+from .scheduler import AdaptiveInterval
+from .sessions import SESSION_FIELDS, SessionStore, SessionTracker
+from .snapshot import EnergyStatsSnapshot
+from .sources import SourceAggregator, breakdown_key, entity_ids
+from .statistics import StatisticsWriter, hour_start
+from .storage import EnergyStatsStorage
+from .stream import SnapshotStream
+from .tariffs import COST_BUCKETS, TARIFF_ROLES, TariffCosts
 
 _LOGGER = logging.getLogger(__name__)
 
-STORAGE_VERSION = 1
-STORAGE_KEY = "energy_stats_data"
+POLLING_INTERVAL = timedelta(seconds=5)
+# Shorter gaps are integrated by the first update from its samples
+BACKFILL_MIN_GAP = timedelta(minutes=5)
+# Delay of the next backfill attempt while the recorder is not available
+BACKFILL_RETRY = timedelta(minutes=5)
+# An input that is unknown or unavailable keeps its last value this long
+INPUT_HOLD_TIME = timedelta(minutes=1)
+# Position of the cost in a session record
+SESSION_COST = SESSION_FIELDS.index("cost")
+# Values sampled for the history API, the powers and the energies of the day
+HISTORY_KEYS = frozenset(
+    [key for key, (device_class, _) in SENSOR_KEYS.items() if device_class == "power"]
+    + [
+        key
+        for key, (_, device_class, *_) in CALCULATED_VALUES.items()
+        if device_class == "energy"
+        and not key.endswith(tuple(f"_{suffix}" for suffix in ROLLUP_PERIODS.values()))
+    ]
+)
 
 
 class EnergyStatsCoordinator(DataUpdateCoordinator):
     """Coordinator class for the module."""
 
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:  # noqa: PLR0915
         """Initialize coordinator with provided config entry."""
         self.entry = entry
         self.hass = hass
+        self.update_mode = entry.data.get(CONF_UPDATE_MODE) or UPDATE_MODE_POLLING
+        self._scheduler = None
+        # Interval of the engine ticks, see engine.py, None in event mode
+        self.tick_interval: timedelta | None = POLLING_INTERVAL
+        # Inputs only report their changes in event mode, so their values are
+        # held between updates and integrated as steps
+        self._step = self.update_mode == UPDATE_MODE_EVENT
+        if self._step:
+            self.tick_interval = None
+        elif self.update_mode == UPDATE_MODE_ADAPTIVE:
+            self._scheduler = AdaptiveInterval(
+                float(entry.data.get(CONF_MIN_INTERVAL) or DEFAULT_MIN_INTERVAL),
+                float(entry.data.get(CONF_MAX_INTERVAL) or DEFAULT_MAX_INTERVAL),
+                float(entry.data.get(CONF_MAX_ERROR) or DEFAULT_MAX_ERROR),
+            )
+            self.tick_interval = timedelta(seconds=self._scheduler.interval)
+        # The engine ticks all entries, the coordinator has no timer of its own
         super().__init__(
             hass=hass,
             logger=_LOGGER,
             name="Energy Stats",
-            update_interval=timedelta(seconds=5),
+            update_interval=None,
             config_entry=entry,
         )
         self.entry_id = entry.entry_id
-        self.sensors = {k: entry.data.get(k) for k in SENSOR_KEYS}
+        self.sensors = {k: entity_ids(entry.data.get(k)) for k in SENSOR_KEYS}
+        self._sources = SourceAggregator(
+            {
+                key: (SENSOR_KEYS[key][0], ids)
+                for key, ids in self.sensors.items()
+                if ids
+            },
+            entry.data.get(CONF_SOURCE_SCALES) or {},
+            INPUT_HOLD_TIME.total_seconds(),
+        )
+        self.entity_ids = self._sources.entity_ids
+        self._breakdown = bool(entry.data.get(CONF_SOURCE_BREAKDOWN))
 
         try:
             self.daily_reset = datetime.strptime(  # noqa: DTZ007
@@ -46,38 +155,589 @@ class EnergyStatsCoordinator(DataUpdateCoordinator):
             except ValueError:
                 _LOGGER.exception("Reset time could not be parsed!")
 
-        _LOGGER.debug("Initialized daily_reset type:")
-        _LOGGER.debug(str(self.daily_reset))
-        self._store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}_{entry.entry_id}")
+        _LOGGER.debug("Initialized daily reset time: %s", self.daily_reset)
+        # Instrumentation of the update path, None when disabled
+        self.metrics = (
+            EnergyStatsMetrics() if entry.data.get(CONF_INSTRUMENTATION) else None
+        )
+        flush_interval = entry.data.get(CONF_FLUSH_INTERVAL)
+        if flush_interval is None:
+            flush_interval = DEFAULT_FLUSH_INTERVAL
+        self._storage = EnergyStatsStorage(
+            hass,
+            entry.entry_id,
+            float(flush_interval),
+            self._saved_buckets(),
+            store=async_get_engine(hass).store,
+            journal=bool(entry.data.get(CONF_JOURNAL)),
+            metrics=self.metrics,
+        )
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        # Time of the last update before the restart, for the backfill
+        self._stored_update: datetime | None = None
+        # Downtimes not backfilled yet, kept until the recorder is available
+        self._backfill_gaps: list[tuple[datetime, datetime]] = []
+        self._unsub_backfill: CALLBACK_TYPE | None = None
 
         self._last_update = datetime.now(UTC)
         self._energy_sums = {}
         self._last_reset = datetime.now(UTC)
+        # First daily reset after the running day, computed once per day
+        self._next_reset = self._reset_after(self._last_reset)
+        self._unsub_reset: CALLBACK_TYPE | None = None
+        self._unsub_hour: CALLBACK_TYPE | None = None
         self._energy_baselines = {}
-        self._pv_sums = {}
-        self._grid_sums = {}
+        self._flows = FlowMatrix()
+        # Previous samples of the integrated powers for trapezoidal integration
+        self._last_powers = {}
+        # Input entities that were unknown or unavailable in the latest update
+        self.missing_inputs: frozenset[str] = frozenset()
+        # Flow cells the configured inputs can populate
+        sources = {"grid", "pv", "battery"}
+        sinks = {"home", "grid", "car", "battery"}
+        if not self.sensors["pv_power"]:
+            sources.discard("pv")
+        if not self.sensors["battery_power"]:
+            sources.discard("battery")
+            sinks.discard("battery")
+        if not self.sensors["car_charging_power"]:
+            sinks.discard("car")
+        self._flow_cells = [
+            cell
+            for cell in FLOW_CELLS
+            if cell.split("_")[0] in sources and cell.split("_")[1] in sinks
+        ]
+        # Ratios the configured inputs can populate, see RATIO_KEYS
+        self._ratio_keys = [
+            key
+            for key, required in (
+                ("home_energy_mix", None),
+                ("battery_energy_mix", "battery_power"),
+                ("car_charging_energy_mix", "car_charging_power"),
+                ("self_consumption", "pv_power"),
+                ("self_sufficiency", None),
+            )
+            if required is None or self.sensors[required]
+        ]
+        # Keys of the sensors, known from the configuration before any update
+        energy_keys = ["grid_in_energy_daily", "grid_out_energy_daily"]
+        if self.sensors["pv_power"] or self.sensors["pv_energy"]:
+            energy_keys.append("pv_energy_daily")
+        energy_keys.append("home_energy_daily")
+        self._rollup_energy_keys = [
+            key
+            for key, daily_key in ROLLUP_ENERGY_KEYS.items()
+            if daily_key in energy_keys
+        ]
+        # Daily costs and revenue, None without prices, see tariffs.py
+        self._tariffs = (
+            TariffCosts()
+            if entry.data.get(CONF_COSTS)
+            or any(self.sensors[role] for role in TARIFF_ROLES.values())
+            else None
+        )
+        self._cost_buckets = [
+            bucket
+            for bucket in COST_BUCKETS
+            if self._tariffs is not None
+            and (bucket != "car_cost" or "grid_car" in self._flow_cells)
+        ]
+        self.calculated_keys = [
+            *energy_keys,
+            *(f"flow_{cell}" for cell in self._flow_cells),
+            *(RATIO_KEYS[key] for key in self._ratio_keys),
+            *(
+                f"{key}_{suffix}"
+                for suffix in ROLLUP_PERIODS.values()
+                for key in (*self._rollup_energy_keys, *self._ratio_keys)
+            ),
+            *(f"{bucket}_daily" for bucket in self._cost_buckets),
+        ]
+        # Key -> entity of the daily energies of single sources, see sources.py
+        self.breakdown_keys = (
+            {
+                breakdown_key(entity_id): entity_id
+                for entity_id in self._sources.breakdown_entities()
+            }
+            if self._breakdown
+            else {}
+        )
+        # Columns of the hourly buckets, see export.py
+        self.hour_keys = [
+            *self._rollup_energy_keys,
+            *self._flow_cells,
+            *self._ratio_keys,
+        ]
+        self._rollups = RollupTree()
+        # Running car charging session, None without car inputs
+        self._sessions = (
+            SessionTracker()
+            if self.sensors["car_connected"] or self.sensors["car_charging_power"]
+            else None
+        )
+        self.session_store = SessionStore(hass, entry.entry_id)
+        if self._sessions is not None and self._tariffs is not None:
+            self.calculated_keys.append("car_charging_cost")
+        # Hourly long-term statistics, None when disabled
+        self._statistics = (
+            StatisticsWriter(hass, entry.entry_id, None)
+            if entry.data.get(CONF_STATISTICS)
+            else None
+        )
+        # Intraday samples of the HISTORY_KEYS values, see history.py
+        self.history: dict[str, TimeSeriesBuffer] = {}
+        # Values as served by the API, replaced on every update
+        self.snapshot = EnergyStatsSnapshot(secrets.token_hex(4))
+        # Keys whose values changed in the latest update
+        self.changed_keys: frozenset[str] = frozenset()
+        self.stream = SnapshotStream()
 
-        _LOGGER.info("Update interval is %s", self.update_interval)
+        _LOGGER.info(
+            "Update mode is %s, interval is %s", self.update_mode, self.tick_interval
+        )
+
+    @callback
+    def async_track_inputs(self) -> CALLBACK_TYPE:
+        """Subscribe to state changes of the configured input entities."""
+        _LOGGER.debug("Tracking state changes of %s", self.entity_ids)
+        return async_track_state_change_event(
+            self.hass, self.entity_ids, self._async_handle_state_change
+        )
+
+    @callback
+    def _async_handle_state_change(self, event: Event[EventStateChangedData]) -> None:
+        """Integrate up to the time of an input change and push the result."""
+        old_state = event.data["old_state"]
+        new_state = event.data["new_state"]
+        if (
+            old_state is not None
+            and new_state is not None
+            and old_state.state == new_state.state
+        ):
+            # Attribute-only change, the integral is unaffected
+            return
 
-    async def _async_update_data(self) -> dict[str, float | bool | list[str]]:  # noqa: C901, PLR0912, PLR0915
+        if not self._loaded:
+            self._async_retry_load()
+            return
+
+        self.async_set_updated_data(self._timed_update(event.time_fired))
+
+    @callback
+    def async_engine_update(
+        self, now: datetime, states: Mapping[str, State | None]
+    ) -> None:
+        """Update from the input states read by the engine for all entries."""
+        if not self._loaded:
+            self._async_retry_load()
+            return
+        elapsed = (now - self._last_update).total_seconds()
+        result = self._timed_update(now, states)
+        self._adapt_interval(result, elapsed)
+        self.async_set_updated_data(result)
+
+    @callback
+    def _async_retry_load(self) -> None:
+        """Refresh again if the first refresh failed before the data was loaded."""
+        # The stored data is restored, but the downtime is not backfilled yet
+        if not self._load_lock.locked():
+            self.hass.async_create_task(
+                self.async_request_refresh(), "energy_stats retry load"
+            )
+
+    async def _async_update_data(self) -> dict[str, float | bool]:
         _LOGGER.debug("Executing _async_update_data")
 
-        if not self._energy_sums:
-            stored = await self._store.async_load()
-            if stored:
-                self._energy_sums = stored.get("energy_sums", {}) or {}
-                self._energy_baselines = stored.get("energy_baselines", {}) or {}
-                self._pv_sums = stored.get("pv_sums", {}) or {}
-                self._grid_sums = stored.get("grid_sums", {}) or {}
-                self._last_reset = datetime.fromisoformat(stored.get("last_reset"))
-            else:
-                self._energy_sums = {}
-                self._energy_baselines = {}
-                self._pv_sums = {}
-                self._grid_sums = {}
-                self._last_reset = datetime.now(UTC)
+        await self._async_load_data()
+        now = datetime.now(UTC)
+        elapsed = (now - self._last_update).total_seconds()
+        result = self._timed_update(now)
+        self._adapt_interval(result, elapsed)
+        return result
+
+    def _adapt_interval(self, result: dict[str, Any], elapsed: float) -> None:
+        """Derive the next polling interval from the latest values."""
+        if self._scheduler is not None:
+            self.tick_interval = self._scheduler.next(
+                result, elapsed, active=bool(result.get("car_connected"))
+            )
+
+    async def async_shutdown(self) -> None:
+        """Stop updating and write pending changes."""
+        await super().async_shutdown()
+        if self._unsub_reset is not None:
+            self._unsub_reset()
+            self._unsub_reset = None
+        if self._unsub_backfill is not None:
+            self._unsub_backfill()
+            self._unsub_backfill = None
+        if self._unsub_hour is not None:
+            self._unsub_hour()
+            self._unsub_hour = None
+        self.stream.close()
+        await self._storage.async_close()
 
+    async def async_load_stored(self) -> None:
+        """
+        Restore the stored data and publish the values derived from it.
+
+        Only the Store is read, so sensors can be set up without waiting for
+        any input entity. Values of a day that has ended are not published.
+        """
+        stored = await self._storage.async_load()
+        await self.session_store.async_load()
+        if stored:
+            self._energy_sums = stored.get("energy_sums", {}) or {}
+            self._energy_baselines = stored.get("energy_baselines", {}) or {}
+            self._flows = FlowMatrix(stored.get("flows"))
+            self._rollups = RollupTree(stored.get("rollups"))
+            self._sources.load_energies(stored.get("sources"))
+            if self._sessions is not None:
+                self._sessions = SessionTracker(stored.get("session"))
+            if self._tariffs is not None:
+                self._tariffs = TariffCosts(stored.get("tariffs"))
+            if self._statistics is not None:
+                self._statistics = StatisticsWriter(
+                    self.hass, self.entry_id, stored.get("statistics")
+                )
+            self._last_reset = datetime.fromisoformat(stored.get("last_reset"))
+            self._next_reset = self._reset_after(self._last_reset)
+            if stored.get("last_update"):
+                self._stored_update = datetime.fromisoformat(stored["last_update"])
+            self._backfill_gaps = [
+                (datetime.fromisoformat(start), datetime.fromisoformat(end))
+                for start, end in stored.get("backfill_gaps") or []
+            ]
+
+        self.data = {}
+        if stored and self._last_reset >= self._period_start(datetime.now(UTC)):
+            self.data = self._derived_values()
+            self.snapshot = self.snapshot.next(self.data)
+
+    async def _async_load_data(self) -> None:
+        """Reset an ended day and backfill the downtime on the first update."""
+        async with self._load_lock:
+            if not self._loaded:
+                await self._async_load_downtime()
+
+    async def _async_load_downtime(self) -> None:
+        """Run the steps of the first load, retried if any of them raised."""
+        await self._async_setup_statistics()
         now = datetime.now(UTC)
+        period_start = self._period_start(now)
+        compiled = compiled_until(now)
+        if self._last_reset < period_start:
+            if self._stored_update is not None:
+                # The part of the downtime before the reset belongs to the
+                # ended day, a retried load must not open it twice
+                self._open_gap(self._stored_update, min(self._next_reset, compiled))
+                self._stored_update = max(self._stored_update, self._next_reset)
+                await self._async_backfill()
+            self._reset_daily(period_start)
+        elif self._rollups.start_day(self._period_day(now)):
+            self._storage.async_mark_dirty("rollups")
+        if self._stored_update is not None:
+            self._open_gap(max(self._stored_update, period_start), compiled)
+            # A retried load must not open the gap twice
+            self._stored_update = None
+        await self._async_backfill()
+        # Hours closed before the restart that were not imported yet
+        self._emit_statistics()
+        self._schedule_reset()
+        if self._step:
+            self._schedule_hour_close()
+        self._loaded = True
+
+    async def _async_setup_statistics(self) -> None:
+        """Continue the sums of the statistics imported before."""
+        if self._statistics is None:
+            return
+        if "recorder" not in self.hass.config.components:
+            _LOGGER.warning("Recorder is not loaded, statistics are not written")
+            self._statistics = None
+            return
+        await self._statistics.async_load_sums([*ROLLUP_ENERGY_KEYS, *self._flow_cells])
+
+    def _emit_statistics(self) -> None:
+        """Import the closed hours of the day as long-term statistics."""
+        if self._statistics is None:
+            return
+        rollups = self._rollups
+        self._statistics.queue(
+            rollups.hours(self._day_totals()), rollups.ids.get("hour")
+        )
+        if self._statistics.async_emit():
+            self._storage.async_mark_dirty("statistics")
+
+    def _open_gap(self, start: datetime, end: datetime) -> None:
+        """
+        Record a downtime to backfill and continue the updates after it.
+
+        The short-term statistics are compiled every 5 minutes, so the gap
+        must end at a compiled period, see backfill.compiled_until, and the
+        first update integrates the rest from its samples.
+        """
+        if end - start < BACKFILL_MIN_GAP:
+            # The first update integrates from the time of the last one
+            self._last_update = start
+            return
+        self._last_update = end
+        self._backfill_gaps.append((start, end))
+        self._storage.async_mark_dirty("backfill_gaps")
+
+    async def _async_backfill(self) -> None:
+        """
+        Integrate the power entities over the open gaps from the recorder.
+
+        While the recorder is not loaded or its query fails, the gaps stay
+        open and the backfill is retried. Gaps of an ended day are dropped.
+        """
+        self._drop_ended_gaps()
+        if not self._backfill_gaps:
+            return
+        if "recorder" not in self.hass.config.components:
+            self._schedule_backfill()
+            return
+
+        for start, end in list(self._backfill_gaps):
+            _LOGGER.info("Backfilling energy stats from %s to %s", start, end)
+            try:
+                hours = await get_instance(self.hass).async_add_executor_job(
+                    hourly_from_statistics,
+                    self.hass,
+                    start,
+                    end,
+                    self.sensors,
+                    self.entry.data.get(CONF_SOURCE_SCALES) or {},
+                )
+            except Exception:
+                _LOGGER.exception("Backfill from recorder statistics failed")
+                self._schedule_backfill()
+                return
+            if (start, end) not in self._backfill_gaps or start < self._last_reset:
+                # The day ended during the query
+                continue
+            self._backfill_gaps.remove((start, end))
+            self._storage.async_mark_dirty("backfill_gaps")
+            self._add_hours(hours, self._hour_id(self._last_update))
+
+    def _drop_ended_gaps(self) -> None:
+        """Drop the gaps before the running day, which can no longer be added."""
+        gaps = [gap for gap in self._backfill_gaps if gap[0] >= self._last_reset]
+        if len(gaps) != len(self._backfill_gaps):
+            _LOGGER.warning(
+                "Dropping downtimes of an ended day that were not backfilled"
+            )
+            self._backfill_gaps = gaps
+            self._storage.async_mark_dirty("backfill_gaps")
+
+    @callback
+    def _schedule_backfill(self) -> None:
+        """Try the backfill of the open gaps again later."""
+        if self._unsub_backfill is None:
+            self._unsub_backfill = async_call_later(
+                self.hass, BACKFILL_RETRY, self._async_retry_backfill
+            )
+
+    async def _async_retry_backfill(self, _now: datetime) -> None:
+        self._unsub_backfill = None
+        gaps = len(self._backfill_gaps)
+        await self._async_backfill()
+        if len(self._backfill_gaps) != gaps:
+            self._storage.async_commit()
+            self._async_publish_derived()
+
+    def _add_hours(self, hours: dict[int, dict[str, float]], running: int) -> None:
+        """
+        Add energies integrated per hour elsewhere, e.g. by a backfill.
+
+        Every hour goes to its own rollup bucket and the provided hour becomes
+        the running one, so the next update does not fold them into one hour.
+        """
+        rollup_keys = {daily_key: key for key, daily_key in ROLLUP_ENERGY_KEYS.items()}
+        day_hours = self.day_hours()
+        for hour_id, energies in hours.items():
+            hour = {
+                rollup_keys.get(key, key): value
+                for key, value in energies.items()
+                if key in FLOW_CELLS or key in rollup_keys
+            }
+            hour["home_energy"] = FlowMatrix(hour).sink_total("home")
+            sums = day_hours.setdefault(hour_id, {})
+            for key, value in hour.items():
+                sums[key] = sums.get(key, 0.0) + value
+
+        totals = sum_hours(hours)
+        for key in POWER_ENERGY_KEYS:
+            if key in totals:
+                self._energy_sums[key] = self._energy_sums.get(key, 0.0) + totals[key]
+        self._flows.add(
+            {cell: value for cell, value in totals.items() if cell in FLOW_CELLS}
+        )
+        self._energy_sums["home_energy_daily"] = self._flows.sink_total("home")
+        self._rollups.replace_hours(
+            dict(sorted(day_hours.items())), self._day_totals(), running=running
+        )
+        self._storage.async_mark_dirty("energy_sums", "flows", "rollups")
+
+    async def async_recompute(self) -> None:
+        """
+        Integrate the closed hours of the day again from the recorder.
+
+        For corrected inputs or scales. The short-term statistics are read and
+        integrated per hour in the recorder executor, see
+        calculations.hourly_energies, so the event loop only merges the hours.
+        Energies read from counters and the running hour are kept.
+        """
+        if not self._loaded:
+            msg = "The stored data is not loaded yet"
+            raise HomeAssistantError(msg)
+        if "recorder" not in self.hass.config.components:
+            msg = "Recorder is not loaded"
+            raise HomeAssistantError(msg)
+        start = self._last_reset
+        running = self._rollups.ids.get("hour")
+        end = hour_start(running) if running is not None else start
+        if end <= start:
+            return
+
+        _LOGGER.info("Recomputing energy stats from %s to %s", start, end)
+        hours = await get_instance(self.hass).async_add_executor_job(
+            hourly_from_statistics,
+            self.hass,
+            start,
+            end,
+            self.sensors,
+            self.entry.data.get(CONF_SOURCE_SCALES) or {},
+        )
+        if self._last_reset != start or self._rollups.ids.get("hour") != running:
+            msg = "The hour ended during the recomputation, try again"
+            raise HomeAssistantError(msg)
+
+        # Rollup key of every daily energy that is integrated from a power
+        rollup_keys = {
+            daily_key: key
+            for key, daily_key in ROLLUP_ENERGY_KEYS.items()
+            if daily_key in POWER_ENERGY_KEYS
+            and not self.sensors[POWER_ENERGY_KEYS[daily_key][0]]
+            and self.sensors[POWER_ENERGY_KEYS[daily_key][1]]
+        }
+        replaced = {*FLOW_CELLS, "home_energy", *rollup_keys.values()}
+        day_hours = self.day_hours()
+        for hour_id in hours.keys() - day_hours.keys():
+            day_hours[hour_id] = {}
+        for hour_id, energies in day_hours.items():
+            if hour_id == running:
+                continue
+            recomputed = hours.get(hour_id, {})
+            merged = {
+                key: value for key, value in energies.items() if key not in replaced
+            }
+            merged.update(
+                (rollup_keys.get(key, key), value)
+                for key, value in recomputed.items()
+                if key in FLOW_CELLS or key in rollup_keys
+            )
+            merged["home_energy"] = FlowMatrix(merged).sink_total("home")
+            day_hours[hour_id] = merged
+
+        totals = sum_hours(day_hours)
+        self._flows.energies = {
+            cell: value for cell, value in totals.items() if cell in FLOW_CELLS
+        }
+        for daily_key, key in rollup_keys.items():
+            self._energy_sums[daily_key] = totals.get(key, 0.0)
+        self._energy_sums["home_energy_daily"] = self._flows.sink_total("home")
+        self._rollups.replace_hours(dict(sorted(day_hours.items())), self._day_totals())
+        if self._tariffs is not None:
+            self._tariffs.reprice(
+                self.day_hours(), start.timestamp(), self._last_update.timestamp()
+            )
+        self._storage.async_mark_dirty("energy_sums", "flows", "rollups", "tariffs")
+        self._storage.async_commit()
+        self._async_publish_derived()
+
+    def _saved_buckets(self) -> dict[str, Callable[[], Any]]:
+        """Return the getters of the stored buckets."""
+        return {
+            "energy_sums": lambda: self._energy_sums,
+            "flows": lambda: self._flows.energies,
+            "rollups": lambda: self._rollups.as_dict(),
+            "sources": lambda: self._sources.energies_by_entity(),
+            "session": lambda: self._sessions.as_dict() if self._sessions else {},
+            "statistics": lambda: (
+                self._statistics.as_dict() if self._statistics else {}
+            ),
+            "tariffs": lambda: self._tariffs.as_dict() if self._tariffs else {},
+            "energy_baselines": lambda: self._energy_baselines,
+            "last_reset": lambda: self._last_reset.isoformat(),
+            "last_update": lambda: self._last_update.isoformat(),
+            "backfill_gaps": lambda: [
+                [start.isoformat(), end.isoformat()]
+                for start, end in self._backfill_gaps
+            ],
+        }
+
+    @callback
+    def _schedule_reset(self) -> None:
+        """Update exactly at the next daily reset."""
+        if self._unsub_reset is not None:
+            self._unsub_reset()
+        self._unsub_reset = async_track_point_in_utc_time(
+            self.hass, self._async_handle_reset, self._next_reset
+        )
+
+    @callback
+    def _async_handle_reset(self, _now: datetime) -> None:
+        """Close the day at its end, without waiting for the next input."""
+        self._unsub_reset = None
+        if not self._loaded:
+            return
+        self.async_set_updated_data(self._timed_update(dt_util.utcnow()))
+        if self._unsub_reset is None:
+            # Clock skew, the update came before the reset
+            self._schedule_reset()
+
+    @callback
+    def _schedule_hour_close(self, now: datetime | None = None) -> None:
+        """Update at the next hour, inputs may not change before in event mode."""
+        now = now or dt_util.utcnow()
+        self._unsub_hour = async_track_point_in_utc_time(
+            self.hass, self._async_handle_hour, hour_start(self._hour_id(now) + 1)
+        )
+
+    @callback
+    def _async_handle_hour(self, now: datetime) -> None:
+        """Close the rollup hour at its end, without waiting for the next input."""
+        self._unsub_hour = None
+        self.async_set_updated_data(self._timed_update(dt_util.utcnow()))
+        self._schedule_hour_close(now)
+
+    def _timed_update(
+        self, now: datetime, states: Mapping[str, State | None] | None = None
+    ) -> dict[str, float | bool]:
+        if self._last_update < self._next_reset < now:
+            # The interval crosses the reset, the part before belongs to the
+            # ending day
+            self._timed_update(self._next_reset, states)
+            changed = self.changed_keys
+            result = self._timed_update(now, states)
+            # The sensors are written once, for the changes of both parts
+            self.changed_keys |= changed
+            return result
+        metrics = self.metrics
+        if metrics is None:
+            return self._process_update(now, states)
+        started = time.perf_counter()
+        try:
+            return self._process_update(now, states)
+        finally:
+            metrics.update_duration.observe(time.perf_counter() - started)
+
+    def _process_update(  # noqa: PLR0912, PLR0915
+        self, now: datetime, states: Mapping[str, State | None] | None = None
+    ) -> dict[str, float | bool]:
         elapsed_h = (
             (now - self._last_update).total_seconds() / 3600.0
             if self._last_update
@@ -85,52 +745,22 @@ class EnergyStatsCoordinator(DataUpdateCoordinator):
         )
         self._last_update = now
 
-        state = self.hass.states
+        if states is None:
+            states = self.hass.states
 
         result = {}
-        self._calculated_keys = []
-
-        def get_value(entity_id: str) -> float | bool | None:
-            if not entity_id:
-                return None
-            st = state.get(entity_id)
-            if not st or st.state in ("unknown", "unavailable", None):
-                return None
-            try:
-                val = float(st.state)
-
-                unit = st.attributes.get("unit_of_measurement")
-                if unit:
-                    unit = unit.lower()
-                    if unit in ("kw", "kwatt", "kilowatt"):
-                        val = val * 1000  # → W
-                    if unit in ("kwh", "kwhours", "kilowatt-hour", "kilowatt hour"):
-                        val = val * 1000  # → Wh
-
-                return val  # noqa: TRY300
-
-            except (ValueError, TypeError):
-                if st.state == "on":
-                    return True
-                if st.state == "off":
-                    return False
-                return None
-
-        # Get raw values
-        raw_vals = {}
-        for key in SENSOR_KEYS:
-            entity_id = self.sensors.get(key)
-            if entity_id is not None:
-                value = get_value(entity_id)
-                if value is None:
-                    errmsg = f"Entity {entity_id} is not ready!"
-                    _LOGGER.debug(errmsg)
-                    raise UpdateFailed(errmsg)
-                raw_vals[key] = value
-                _LOGGER.debug("Value for %s: %s", key, str(raw_vals[key]))
-            else:
-                _LOGGER.debug("No Entity found for %s", key)
-                raw_vals[key] = None
+
+        # Get raw values, summed per role, see sources.py
+        raw_vals = dict.fromkeys(SENSOR_KEYS)
+        raw_vals.update(self._sources.read(states, now.timestamp()))
+        missing = self._sources.missing
+        if self.metrics is not None:
+            for entity_id in missing:
+                self.metrics.observe_failure(entity_id)
+        if frozenset(missing) != self.missing_inputs:
+            self.missing_inputs = frozenset(missing)
+            if missing:
+                _LOGGER.info("Inputs not ready, continuing without: %s", missing)
 
         # Momentary powers
         if raw_vals["grid_power"] is not None:
@@ -178,94 +808,295 @@ class EnergyStatsCoordinator(DataUpdateCoordinator):
         )
 
         if raw_vals["battery_energy"] is not None:
-            self._energy_sums["battery_energy"] = raw_vals["battery_energy"]
+            self._set_energy_sum("battery_energy", raw_vals["battery_energy"])
 
-        grid_in = self._energy_sums.get("grid_in_energy")
-        grid_out = self._energy_sums.get("grid_out_energy", 0.0)
-        pv_e = self._energy_sums.get("pv_energy")
-        if grid_in is not None and pv_e is not None:
-            home_energy = grid_in + pv_e - grid_out
-            self._energy_sums["home_energy_daily"] = home_energy
-
-        result.update(dict(self._energy_sums.items()))
-
-        def _mix_ratio(key: str) -> float:
-            pv_sum = self._pv_sums.get(key, 0.0)
-            grid_sum = self._grid_sums.get(key, 0.0)
-            total = pv_sum + grid_sum
-            return pv_sum / total if total > 0 else 0
-
-        # --- Energy Mixes ---
-        if raw_vals["battery_power"] and raw_vals["battery_power"] > 0:
-            self._add_mix_energy(
-                "battery_power",
+        # --- Energy flows ---
+        # Without the grid balance nothing can be allocated
+        flows = None
+        if raw_vals["grid_power"] is not None:
+            flows = allocate_flows(
                 raw_vals["pv_power"],
                 raw_vals["grid_power"],
-                elapsed_h,
+                raw_vals["battery_power"],
+                raw_vals["car_charging_power"],
             )
-            result["battery_energy_mix_daily"] = _mix_ratio("battery_energy")
-            self._calculated_keys.append("battery_energy_mix_daily")
+            if self._flows.integrate(flows, elapsed_h, step=self._step):
+                self._storage.async_mark_dirty("flows")
+        if self._breakdown and self._sources.integrate(elapsed_h, step=self._step):
+            self._storage.async_mark_dirty("sources")
 
-        self._add_mix_energy(
-            "home_energy_daily",
-            raw_vals["pv_power"],
-            raw_vals["grid_power"],
-            elapsed_h,
-            result.get("battery_power"),
-            result.get("battery_energy_mix_daily"),
-        )
-        result["home_energy_mix_daily"] = _mix_ratio("home_energy_daily")
-        self._calculated_keys.append("home_energy_mix_daily")
+        costs = self._update_costs(now, raw_vals, flows, elapsed_h)
 
-        if raw_vals["car_charging_power"] is not None:
-            self._add_mix_energy(
-                "car_charging_energy",
-                raw_vals["pv_power"],
-                raw_vals["grid_power"],
+        # --- Charging sessions ---
+        if self._sessions is not None:
+            connected = raw_vals["car_connected"]
+            if connected is None and self.sensors["car_connected"]:
+                # The plug state is unavailable, the session stays as it is
+                connected = bool(self._sessions.session)
+            record = self._sessions.update(
+                now.timestamp(),
                 elapsed_h,
-                result.get("battery_power"),
-                result.get("battery_energy_mix_daily"),
+                connected=connected,
+                power=raw_vals["car_charging_power"],
+                flows=flows,
+                soc=raw_vals["car_soc"],
+                battery_pv_share=self._flows.battery_pv_share(),
+                cost=costs.get("car_cost", 0.0),
+                energy=raw_vals["car_charging_energy"],
+                step=self._step,
             )
-            result["car_charging_energy_mix"] = _mix_ratio("car_charging_energy")
-            self._calculated_keys.append("car_charging_energy_mix")
+            if self._sessions.session or record is not None:
+                self._storage.async_mark_dirty("session")
+            if record is not None:
+                self.session_store.async_append(record)
+        self._set_energy_sum("home_energy_daily", self._flows.sink_total("home"))
+
+        # --- Rollups ---
+        if self._rollups.update_hour(self._hour_id(now), self._day_totals()):
+            self._storage.async_mark_dirty("rollups")
+            self._emit_statistics()
+
+        result.update(self._derived_values())
 
         # Daily reset
-        local_tz = dt_util.DEFAULT_TIME_ZONE
-        reset_time_utc = (
-            datetime.combine(dt_util.now(time_zone=local_tz).date(), self.daily_reset)
-            .replace(tzinfo=local_tz)
-            .astimezone(UTC)
+        if now >= self._next_reset:
+            self._reset_daily(now)
+
+        if self._storage.dirty:
+            self._storage.async_mark_dirty("last_update")
+        self._storage.async_commit()
+
+        self._record_history(now, result)
+        self._publish(result)
+
+        _LOGGER.debug("Done running update: %s", result)
+
+        return result
+
+    def _update_costs(
+        self,
+        now: datetime,
+        prices: dict[str, float | bool | None],
+        flows: dict[str, float] | None,
+        elapsed_h: float,
+    ) -> dict[str, float]:
+        """Price the flows since the previous update, return the added costs."""
+        if self._tariffs is None:
+            return {}
+        timestamp = now.timestamp()
+        if self._tariffs.observe(prices, timestamp):
+            self._storage.async_mark_dirty("tariffs")
+        if flows is None:
+            return {}
+        costs = self._tariffs.integrate(
+            flows, timestamp - elapsed_h * 3600, timestamp, step=self._step
+        )
+        if costs:
+            self._storage.async_mark_dirty("tariffs")
+        return costs
+
+    def _publish(self, result: dict[str, float | bool]) -> None:
+        """Take the result as snapshot and notify the streams of the changes."""
+        snapshot = self.snapshot
+        self.snapshot = snapshot.next(result)
+        self.changed_keys = (
+            frozenset() if self.snapshot is snapshot else self.snapshot.changed_keys
+        )
+        self.stream.publish(snapshot, self.snapshot)
+
+    @callback
+    def async_set_prices(self, tariff: str, points: list[tuple[float, float]]) -> None:
+        """Load or correct the prices of a tariff and price the day again."""
+        if self._tariffs is None:
+            return
+        self._tariffs.curves[tariff].update(points)
+        self._tariffs.reprice(
+            self._rollups.hours(self._day_totals()),
+            self._last_reset.timestamp(),
+            self._last_update.timestamp(),
         )
+        self._storage.async_mark_dirty("tariffs")
+        self._storage.async_commit()
+        if self._loaded:
+            self._async_publish_derived()
 
-        _LOGGER.debug("Planned reset time (UTC): %s", str(reset_time_utc))
-        _LOGGER.debug("Current time (UTC): %s", str(now))
-        if now >= reset_time_utc and self._last_reset < reset_time_utc:
-            _LOGGER.info("Energy Stats: Resetting daily values to 0.")
-            self._energy_sums = {}
-            self._energy_baselines = {}
-            self._pv_sums = {}
-            self._grid_sums = {}
-            self._last_reset = now
+    @callback
+    def _async_publish_derived(self) -> None:
+        """Publish the values derived from changed data outside of an update."""
+        result = {**(self.data or {}), **self._derived_values()}
+        self._publish(result)
+        self.async_set_updated_data(result)
 
-        result["calculated_keys"] = self._calculated_keys
+    def _derived_values(self) -> dict[str, float]:
+        """Return the energies, flows, ratios and rollups of the stored data."""
+        result = dict(self._energy_sums)
 
-        try:
-            await self._store.async_save(
-                {
-                    "energy_sums": self._energy_sums,
-                    "pv_sums": self._pv_sums,
-                    "grid_sums": self._grid_sums,
-                    "energy_baselines": self._energy_baselines,
-                    "last_reset": self._last_reset.isoformat(),
-                }
-            )
-        except Exception:
-            _LOGGER.exception("Error while saving stats")
+        energies = self._flows.energies
+        for cell in self._flow_cells:
+            result[f"flow_{cell}"] = energies.get(cell, 0.0)
 
-        _LOGGER.debug("Done running update: %s ", str(result))
+        # --- Energy Mixes ---
+        result.update(
+            (RATIO_KEYS[key], FLOW_RATIOS[key](self._flows)) for key in self._ratio_keys
+        )
+
+        totals = self._day_totals()
+        for period, suffix in ROLLUP_PERIODS.items():
+            period_totals = self._rollups.totals(period, totals)
+            for key in self._rollup_energy_keys:
+                result[f"{key}_{suffix}"] = period_totals.get(key, 0.0)
+            period_flows = FlowMatrix(period_totals)
+            for key in self._ratio_keys:
+                result[f"{key}_{suffix}"] = FLOW_RATIOS[key](period_flows)
 
+        if self._tariffs is not None:
+            costs = self._tariffs.costs
+            for bucket in self._cost_buckets:
+                result[f"{bucket}_daily"] = costs.get(bucket, 0.0)
+            session_cost = self._session_cost()
+            if session_cost is not None:
+                result["car_charging_cost"] = session_cost
+
+        if self._breakdown:
+            result.update(self._sources.breakdown())
         return result
 
+    def _session_cost(self) -> float | None:
+        """Return the cost of the running or else the last charging session."""
+        if self._sessions is None:
+            return None
+        record = self.current_session()
+        if record is None and self.session_store.records:
+            record = self.session_store.records[-1]
+        if record is None or len(record) <= SESSION_COST:
+            return None
+        return record[SESSION_COST]
+
+    def _period_start(self, now: datetime) -> datetime:
+        """Return the last daily reset time at or before now, see rollups.py."""
+        return period_start(now, self.daily_reset, dt_util.DEFAULT_TIME_ZONE)
+
+    def _reset_after(self, now: datetime) -> datetime:
+        """Return the first daily reset time after now."""
+        return reset_after(now, self.daily_reset, dt_util.DEFAULT_TIME_ZONE)
+
+    def _period_day(self, now: datetime) -> date:
+        """Return the local date of the daily period containing now."""
+        return dt_util.as_local(self._period_start(now)).date()
+
+    def _hour_id(self, now: datetime) -> int:
+        return int(now.timestamp()) // 3600
+
+    def _day_totals(self) -> dict[str, float]:
+        """Return the energies of the running day that are rolled up."""
+        totals = {
+            key: self._energy_sums[daily_key]
+            for key, daily_key in ROLLUP_ENERGY_KEYS.items()
+            if daily_key in self._energy_sums
+        }
+        totals.update(self._flows.energies)
+        return totals
+
+    def hour_values(self, energies: dict[str, float]) -> dict[str, float]:
+        """Return rolled up energies with the ratios derived from their flows."""
+        flows = FlowMatrix(energies)
+        return energies | {key: FLOW_RATIOS[key](flows) for key in self._ratio_keys}
+
+    def day_start(self) -> datetime:
+        """Return the start of the running daily period."""
+        return self._period_start(dt_util.utcnow())
+
+    def day_hours(self) -> dict[int, dict[str, float]]:
+        """Return the energies of all hours of the day, including the running one."""
+        return self._rollups.hours(self._day_totals())
+
+    def imported_statistics(self) -> tuple[dict[str, str], int | None]:
+        """Return the statistic ids of the hourly keys and the last imported hour."""
+        if self._statistics is None:
+            return {}, None
+        return (
+            {
+                key: self._statistics.statistic_id(key)
+                for key in (*self._rollup_energy_keys, *self._flow_cells)
+            },
+            self._statistics.hour,
+        )
+
+    def rollup_report(self) -> dict[str, Any]:
+        """Return the energies and ratios of the hours and of all periods."""
+        totals = self._day_totals()
+        values = self.hour_values
+
+        rollups = self._rollups
+        report: dict[str, Any] = {
+            "hours": [
+                {"start": period_label("hour", pid), "values": values(energies)}
+                for pid, energies in rollups.hours(totals).items()
+            ]
+        }
+        for period in PERIODS:
+            for name, energies in (
+                (period, rollups.totals(period, totals)),
+                (f"last_{period}", rollups.buckets.get(f"last_{period}")),
+            ):
+                if name in rollups.ids and energies is not None:
+                    report[name] = {
+                        "start": period_label(period, rollups.ids[name]),
+                        "values": values(energies),
+                    }
+        return report
+
+    def current_session(self) -> list[float | None] | None:
+        """Return the record of the running charging session, if any."""
+        if self._sessions is None:
+            return None
+        return self._sessions.current(self._flows.battery_pv_share())
+
+    def _reset_daily(self, now: datetime) -> None:
+        _LOGGER.info("Energy Stats: Resetting daily values to 0.")
+        if self._statistics is not None:
+            # The running hour continues after the reset
+            running = self._rollups.ids.get("hour")
+            hours = self._rollups.hours(self._day_totals())
+            if running in hours:
+                self._statistics.add_carry(running, hours[running])
+            self._emit_statistics()
+        self._rollups.close_day(
+            self._period_day(self._last_reset),
+            self._day_totals(),
+            self._period_day(now),
+        )
+        self._energy_sums = {}
+        self._energy_baselines = {}
+        self._flows.reset()
+        self._sources.reset()
+        if self._tariffs is not None:
+            self._tariffs.reset(now.timestamp())
+        self._last_reset = now
+        self._next_reset = self._reset_after(now)
+        self._schedule_reset()
+        self._storage.async_mark_dirty(
+            "energy_sums",
+            "energy_baselines",
+            "flows",
+            "sources",
+            "rollups",
+            "statistics",
+            "tariffs",
+            "last_reset",
+        )
+        # Never lose a completed day to a crash
+        self._storage.async_flush_soon()
+
+    def _record_history(self, now: datetime, result: dict) -> None:
+        timestamp = now.timestamp()
+        for key in HISTORY_KEYS & result.keys():
+            value = result[key]
+            buffer = self.history.get(key)
+            if buffer is None:
+                buffer = self.history[key] = TimeSeriesBuffer()
+            buffer.append(timestamp, value)
+
     def _update_energy(
         self,
         key: str,
@@ -276,46 +1107,36 @@ class EnergyStatsCoordinator(DataUpdateCoordinator):
         use_baseline: bool = True,
     ) -> None:
         if energy_sensor_value is not None:
-            baseline = 0
-            if use_baseline:
-                baseline = self._energy_baselines.get(key)
-                if baseline is None:
-                    self._energy_baselines[key] = energy_sensor_value
-                    baseline = energy_sensor_value
-                self._calculated_keys.append(key)
-            self._energy_sums[key] = max(0.0, energy_sensor_value - baseline)
+            baseline = self._energy_baselines.get(key, None if use_baseline else 0.0)
+            if baseline is None:
+                # First reading of the day, or the first after an outage of the
+                # counter, the energy continues from the sum
+                baseline = energy_sensor_value - self._energy_sums.get(key, 0.0)
+                self._energy_baselines[key] = baseline
+                self._storage.async_mark_dirty("energy_baselines")
+            self._set_energy_sum(key, max(0.0, energy_sensor_value - baseline))
             return
 
-        if power_sensor_value is not None and elapsed_h > 0 and power_sensor_value > 0:
-            prev = self._energy_sums.get(key, 0.0)
-            self._energy_sums[key] = prev + (power_sensor_value / 1000.0) * elapsed_h
-            self._calculated_keys.append(key)
-
-    def _add_mix_energy(  # noqa: PLR0913
-        self,
-        key: str,
-        pv_power: float | None,
-        grid_power: float | None,
-        elapsed_h: float,
-        battery_power: float | None = None,
-        battery_pv_factor: float | None = None,
-    ) -> None:
-        if pv_power is None:
-            pv_power = 0
-        if grid_power is None:
-            grid_power = 0
+        if power_sensor_value is None:
+            self._last_powers.pop(key, None)
             return
+        if (
+            self.sensors[POWER_ENERGY_KEYS[key][0]]
+            and self._energy_baselines.get(key, 0.0) is not None
+        ):
+            # The counter is unavailable, its baseline is taken again from the
+            # sum when it returns, so the energy does not jump
+            self._energy_baselines[key] = None
+            self._storage.async_mark_dirty("energy_baselines")
 
-        if battery_power is not None and battery_power > 0:
-            if battery_pv_factor is not None:
-                grid_power += (1 - battery_pv_factor) * battery_power
-                pv_power += battery_pv_factor * battery_power
-            else:
-                grid_power += battery_power
-
-        pv_part = max(0.0, pv_power) * elapsed_h
-        grid_part = max(0.0, grid_power) * elapsed_h
-        self._pv_sums[key] = self._pv_sums.get(key, 0.0) + pv_part
-        self._grid_sums[key] = self._grid_sums.get(key, 0.0) + grid_part
+        power = max(0.0, power_sensor_value)
+        last_power = self._last_powers.get(key, power)
+        self._last_powers[key] = power
+        energy = trapezoid(last_power, power, elapsed_h, step=self._step)
+        if energy > 0:
+            self._set_energy_sum(key, self._energy_sums.get(key, 0.0) + energy)
 
-        _LOGGER.debug("%s: %f, %f", key, self._pv_sums[key], self._grid_sums[key])
+    def _set_energy_sum(self, key: str, value: float) -> None:
+        if self._energy_sums.get(key) != value:
+            self._energy_sums[key] = value
+            self._storage.async_mark_dirty("energy_sums")
@@ -0,0 +1,44 @@
+"""Diagnostics support for Energy Stats integration."""
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """
+    Return diagnostics for a config entry.
+
+    The age of each input state next to its failure count shows whether a
+    stall is caused by an upstream entity or by the integration itself.
+    """
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    now = dt_util.utcnow()
+    metrics = coordinator.metrics
+
+    inputs = {}
+    for key, entity_ids in coordinator.sensors.items():
+        for entity_id in entity_ids:
+            state = hass.states.get(entity_id)
+            inputs[entity_id] = {
+                "role": key,
+                "state": state.state if state else None,
+                "age_s": (now - state.last_updated).total_seconds() if state else None,
+                "missing": entity_id in coordinator.missing_inputs,
+                "failures": metrics.failures[entity_id] if metrics else None,
+            }
+
+    return {
+        "config": dict(entry.data),
+        "update_mode": coordinator.update_mode,
+        "last_update_success": coordinator.last_update_success,
+        "snapshot_version": coordinator.snapshot.version,
+        "inputs": inputs,
+        "metrics": metrics.as_dict() if metrics else None,
+    }
@@ -0,0 +1,111 @@
+"""Engine shared by all config entries of Energy Stats integration."""
+
+import logging
+import math
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, State, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .storage import SharedStore
+
+if TYPE_CHECKING:
+    from .coordinator import EnergyStatsCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ENGINE = f"{DOMAIN}_engine"
+# Entries due within this many seconds are updated in the same tick
+TICK_SLACK = 0.25
+
+
+@callback
+def async_get_engine(hass: HomeAssistant) -> "EnergyStatsEngine":
+    """Return the engine, creating it with the first config entry."""
+    engine = hass.data.get(DATA_ENGINE)
+    if engine is None:
+        engine = hass.data[DATA_ENGINE] = EnergyStatsEngine(hass)
+    return engine
+
+
+class EnergyStatsEngine:
+    """
+    Scheduler and writer of all config entries.
+
+    A single timer wakes up when the earliest entry is due and updates every
+    entry due by then in one batch. The states of the union of their input
+    entities are read once per tick and shared. Due times are aligned to
+    multiples of each entry's interval in whole seconds, so entries with the
+    same interval always tick together. All entries are persisted through one
+    SharedStore.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the engine."""
+        self._hass = hass
+        self.store = SharedStore(hass)
+        # Coordinator -> timestamp of its next update
+        self._due: dict[EnergyStatsCoordinator, float] = {}
+        self._unsub_tick: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_add(self, coordinator: "EnergyStatsCoordinator") -> CALLBACK_TYPE:
+        """Tick a polling coordinator, return the callback removing it."""
+        if coordinator.tick_interval is None:
+            return lambda: None
+        now = dt_util.utcnow().timestamp()
+        self._due[coordinator] = self._next_due(
+            now, coordinator.tick_interval.total_seconds()
+        )
+        self._schedule()
+
+        @callback
+        def remove() -> None:
+            self._due.pop(coordinator, None)
+            self._schedule()
+
+        return remove
+
+    @staticmethod
+    def _next_due(now: float, interval: float) -> float:
+        step = max(1, round(interval))
+        return (math.floor(now / step) + 1) * step
+
+    @callback
+    def _schedule(self) -> None:
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        if not self._due:
+            return
+        delay = min(self._due.values()) - dt_util.utcnow().timestamp()
+        self._unsub_tick = async_call_later(self._hass, max(0.0, delay), self._tick)
+
+    @callback
+    def _tick(self, _now: datetime) -> None:
+        self._unsub_tick = None
+        now = dt_util.utcnow()
+        timestamp = now.timestamp()
+        due = [
+            coordinator
+            for coordinator, due_at in self._due.items()
+            if due_at <= timestamp + TICK_SLACK
+        ]
+
+        entity_ids = set().union(*(coordinator.entity_ids for coordinator in due))
+        get = self._hass.states.get
+        states: dict[str, State | None] = {
+            entity_id: get(entity_id) for entity_id in entity_ids
+        }
+        for coordinator in due:
+            try:
+                coordinator.async_engine_update(now, states)
+            except Exception:
+                _LOGGER.exception("Error updating %s", coordinator.entry_id)
+            self._due[coordinator] = self._next_due(
+                timestamp + TICK_SLACK, coordinator.tick_interval.total_seconds()
+            )
+        self._schedule()
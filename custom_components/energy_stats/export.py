@@ -0,0 +1,198 @@
+"""Streaming bulk export of hourly buckets for Energy Stats integration."""
+
+import csv
+import io
+import math
+from collections.abc import AsyncIterator, Iterable
+from datetime import datetime
+from types import ModuleType
+from typing import TYPE_CHECKING
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.statistics import statistics_during_period
+from homeassistant.core import HomeAssistant
+
+from .statistics import hour_start
+
+if TYPE_CHECKING:
+    from .coordinator import EnergyStatsCoordinator
+
+# Hours fetched from the recorder and encoded at a time
+EXPORT_CHUNK_HOURS = 7 * 24
+
+Rows = list[tuple[int, dict[str, float]]]
+
+
+def import_pyarrow() -> ModuleType | None:
+    """
+    Return pyarrow, which the Arrow format requires, or None if missing.
+
+    Imports the module, so it runs in the import executor.
+    """
+    try:
+        import pyarrow as pa  # noqa: PLC0415
+    except ImportError:
+        return None
+    return pa
+
+
+def fetch_hours(
+    hass: HomeAssistant,
+    statistic_ids: dict[str, str],
+    start: datetime,
+    end: datetime,
+) -> dict[int, dict[str, float]]:
+    """
+    Return the hourly energies imported as long-term statistics.
+
+    Runs in the recorder executor. All statistics are fetched in one query.
+    """
+    stats = statistics_during_period(
+        hass, start, end, set(statistic_ids.values()), "hour", None, {"change"}
+    )
+    hours: dict[int, dict[str, float]] = {}
+    for key, statistic_id in statistic_ids.items():
+        for row in stats.get(statistic_id, ()):
+            if row.get("change") is not None:
+                hours.setdefault(int(row["start"]) // 3600, {})[key] = row["change"]
+    return dict(sorted(hours.items()))
+
+
+async def async_iter_hours(
+    coordinator: "EnergyStatsCoordinator", start: datetime, end: datetime
+) -> AsyncIterator[Rows]:
+    """
+    Yield the hourly energies of a range in chunks, oldest first.
+
+    Hours that were imported as long-term statistics are read from the
+    recorder one chunk at a time, the hours of the running day after them
+    from the rollups. Without statistics only the running day is available.
+    """
+    first = math.floor(start.timestamp() / 3600)
+    last = math.ceil(end.timestamp() / 3600)
+    statistic_ids, imported = coordinator.imported_statistics()
+
+    if statistic_ids:
+        recorder = get_instance(coordinator.hass)
+        stop = min(last, imported + 1)
+        for chunk in range(first, stop, EXPORT_CHUNK_HOURS):
+            hours = await recorder.async_add_executor_job(
+                fetch_hours,
+                coordinator.hass,
+                statistic_ids,
+                hour_start(chunk),
+                hour_start(min(stop, chunk + EXPORT_CHUNK_HOURS)),
+            )
+            if hours:
+                yield list(hours.items())
+
+    rows = [
+        (hour_id, energies)
+        for hour_id, energies in coordinator.day_hours().items()
+        if first <= hour_id < last and (imported is None or hour_id > imported)
+    ]
+    if rows:
+        yield rows
+
+
+class CsvEncoder:
+    """Encoder of hourly rows as CSV with a header line."""
+
+    content_type = "text/csv"
+    extension = "csv"
+
+    def __init__(self, keys: list[str]) -> None:
+        """Initialize the encoder for the provided value columns."""
+        self._keys = keys
+
+    def header(self) -> bytes:
+        """Return the bytes preceding the rows."""
+        return self._encode([["start", *self._keys]])
+
+    def encode(self, rows: Rows) -> bytes:
+        """Return the bytes of a chunk of rows."""
+        keys = self._keys
+        return self._encode(
+            [hour_start(hour_id).isoformat(), *(values.get(key, 0.0) for key in keys)]
+            for hour_id, values in rows
+        )
+
+    def footer(self) -> bytes:
+        """Return the bytes following the rows."""
+        return b""
+
+    @staticmethod
+    def _encode(lines: Iterable[Iterable[object]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(lines)
+        return buffer.getvalue().encode()
+
+
+class _ByteSink(io.RawIOBase):
+    """Writable file collecting the bytes written since it was drained."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ArrowEncoder:
+    """
+    Encoder of hourly rows as an Arrow IPC stream, one record batch per chunk.
+
+    Requires pyarrow, which is passed in after import_pyarrow imported it.
+    """
+
+    content_type = "application/vnd.apache.arrow.stream"
+    extension = "arrows"
+
+    def __init__(self, pa: ModuleType, keys: list[str]) -> None:
+        """Initialize the encoder for the provided value columns."""
+        self._pa = pa
+        self._keys = keys
+        self._schema = pa.schema(
+            [
+                pa.field("start", pa.timestamp("s", tz="UTC")),
+                *(pa.field(key, pa.float64()) for key in keys),
+            ]
+        )
+        self._sink = _ByteSink()
+        self._writer = pa.ipc.new_stream(
+            pa.PythonFile(self._sink, mode="w"), self._schema
+        )
+
+    def header(self) -> bytes:
+        """Return the bytes preceding the rows."""
+        return self._sink.drain()
+
+    def encode(self, rows: Rows) -> bytes:
+        """Return the bytes of a chunk of rows."""
+        pa = self._pa
+        columns = [
+            pa.array([hour_id * 3600 for hour_id, _ in rows], pa.int64()).cast(
+                self._schema.field("start").type
+            ),
+            *(
+                pa.array([float(values.get(key, 0.0)) for _, values in rows])
+                for key in self._keys
+            ),
+        ]
+        self._writer.write_batch(pa.record_batch(columns, schema=self._schema))
+        return self._sink.drain()
+
+    def footer(self) -> bytes:
+        """Return the bytes following the rows."""
+        self._writer.close()
+        return self._sink.drain()
@@ -0,0 +1,111 @@
+"""Daily energy flow matrix for Energy Stats integration."""
+
+from collections.abc import Callable
+
+from .calculations import FLOW_CELLS, trapezoid
+
+
+class FlowMatrix:
+    """
+    Daily energies (Wh) of all source -> sink flows.
+
+    Every cell is integrated incrementally from the allocated powers of
+    consecutive updates with the trapezoidal rule, or as steps, see
+    calculations.trapezoid. Ratios are derived from the
+    cells on demand, so no ratio has to be tracked separately.
+    """
+
+    def __init__(self, energies: dict[str, float] | None = None) -> None:
+        """Initialize the matrix, optionally with stored energies."""
+        self.energies: dict[str, float] = {
+            cell: value
+            for cell, value in (energies or {}).items()
+            if cell in FLOW_CELLS
+        }
+        self._last_flows: dict[str, float] | None = None
+
+    def integrate(
+        self, flows: dict[str, float], elapsed_h: float, *, step: bool = False
+    ) -> bool:
+        """Add the energies since the previous update, return if any changed."""
+        last_flows = self._last_flows or flows
+        self._last_flows = flows
+        if elapsed_h <= 0:
+            return False
+
+        changed = False
+        energies = self.energies
+        for cell, power in flows.items():
+            energy = trapezoid(last_flows[cell], power, elapsed_h, step=step)
+            if energy > 0:
+                energies[cell] = energies.get(cell, 0.0) + energy
+                changed = True
+        return changed
+
+    def add(self, energies: dict[str, float]) -> None:
+        """Add energies integrated elsewhere, e.g. by a backfill."""
+        for cell, energy in energies.items():
+            self.energies[cell] = self.energies.get(cell, 0.0) + energy
+
+    def reset(self) -> None:
+        """Start a new day, keeping the last flows for the next integration."""
+        self.energies = {}
+
+    def source_total(self, source: str) -> float:
+        """Return the energy supplied by a source."""
+        prefix = f"{source}_"
+        return sum(
+            value for cell, value in self.energies.items() if cell.startswith(prefix)
+        )
+
+    def sink_total(self, sink: str) -> float:
+        """Return the energy received by a sink."""
+        suffix = f"_{sink}"
+        return sum(
+            value for cell, value in self.energies.items() if cell.endswith(suffix)
+        )
+
+    def battery_pv_share(self) -> float:
+        """Return the PV share of the energy charged into the battery."""
+        total = self.sink_total("battery")
+        return self.energies.get("pv_battery", 0.0) / total if total > 0 else 0
+
+    def pv_share(self, sink: str) -> float:
+        """
+        Return the PV share of the energy received by a sink.
+
+        Battery discharge counts with the PV share of the charged energy.
+        """
+        if sink == "battery":
+            return self.battery_pv_share()
+        total = self.sink_total(sink)
+        if total <= 0:
+            return 0
+        energies = self.energies
+        pv = energies.get(f"pv_{sink}", 0.0)
+        pv += energies.get(f"battery_{sink}", 0.0) * self.battery_pv_share()
+        return pv / total
+
+    def self_consumption(self) -> float:
+        """Return the share of the PV energy that was not exported."""
+        total = self.source_total("pv")
+        return 1 - self.energies.get("pv_grid", 0.0) / total if total > 0 else 0
+
+    def self_sufficiency(self) -> float:
+        """Return the share of home and car energy not imported from the grid."""
+        total = self.sink_total("home") + self.sink_total("car")
+        if total <= 0:
+            return 0
+        energies = self.energies
+        imported = energies.get("grid_home", 0.0) + energies.get("grid_car", 0.0)
+        return 1 - imported / total
+
+
+# Ratio key (without period) -> derivation from a flow matrix, see RATIO_KEYS
+FLOW_RATIOS: dict[str, Callable[[FlowMatrix], float]] = {
+    "home_energy_mix": lambda flows: flows.pv_share("home"),
+    "battery_energy_mix": FlowMatrix.battery_pv_share,
+    "car_charging_energy_mix": lambda flows: flows.pv_share("car"),
+    "self_consumption": FlowMatrix.self_consumption,
+    "self_sufficiency": FlowMatrix.self_sufficiency,
+}
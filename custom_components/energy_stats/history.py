@@ -0,0 +1,124 @@
+"""Intraday time series handling for Energy Stats integration."""
+
+from array import array
+
+# One day of samples at the minimum spacing below
+HISTORY_CAPACITY = 8640
+# Samples closer than this (seconds) replace the previous sample
+HISTORY_RESOLUTION = 10.0
+
+
+class TimeSeriesBuffer:
+    """Fixed capacity ring buffer of timestamped float samples."""
+
+    __slots__ = ("_capacity", "_size", "_start", "_times", "_values")
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY) -> None:
+        """Initialize an empty buffer with the provided capacity."""
+        self._capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Return the number of stored samples."""
+        return self._size
+
+    def append(self, timestamp: float, value: float) -> None:
+        """Append a sample, overwriting the oldest one when full."""
+        if self._size:
+            last = (self._start + self._size - 1) % self._capacity
+            if timestamp - self._times[last] < HISTORY_RESOLUTION:
+                self._values[last] = value
+                return
+
+        if self._size < self._capacity:
+            pos = (self._start + self._size) % self._capacity
+            self._size += 1
+        else:
+            pos = self._start
+            self._start = (self._start + 1) % self._capacity
+        self._times[pos] = timestamp
+        self._values[pos] = value
+
+    def clear(self) -> None:
+        """Drop all samples."""
+        self._start = 0
+        self._size = 0
+
+    def range(self, start: float, end: float) -> tuple[array, array]:
+        """Return the samples with start <= timestamp <= end in time order."""
+        first = self._bisect(start)
+        last = self._bisect(end, right=True)
+        if first >= last:
+            return array("d"), array("d")
+
+        phys_first = (self._start + first) % self._capacity
+        phys_last = (self._start + last) % self._capacity
+        if phys_first < phys_last:
+            return (
+                self._times[phys_first:phys_last],
+                self._values[phys_first:phys_last],
+            )
+        return (
+            self._times[phys_first:] + self._times[:phys_last],
+            self._values[phys_first:] + self._values[:phys_last],
+        )
+
+    def _bisect(self, timestamp: float, *, right: bool = False) -> int:
+        """Return the logical insertion index of a timestamp."""
+        low, high = 0, self._size
+        while low < high:
+            mid = (low + high) // 2
+            mid_time = self._times[(self._start + mid) % self._capacity]
+            if mid_time < timestamp or (right and mid_time == timestamp):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+
+def downsample_lttb(
+    times: array, values: array, points: int
+) -> tuple[list[float], list[float]]:
+    """Reduce a series to the given number of points using LTTB."""
+    size = len(times)
+    if points >= size or points < 3:  # noqa: PLR2004
+        return times.tolist(), values.tolist()
+
+    out_times = [times[0]]
+    out_values = [values[0]]
+    bucket_size = (size - 2) / (points - 2)
+    selected = 0
+
+    for bucket in range(points - 2):
+        # Average of the next bucket is the third triangle corner
+        avg_start = int((bucket + 1) * bucket_size) + 1
+        avg_end = min(int((bucket + 2) * bucket_size) + 1, size)
+        avg_len = avg_end - avg_start
+        avg_time = sum(times[avg_start:avg_end]) / avg_len
+        avg_value = sum(values[avg_start:avg_end]) / avg_len
+
+        sel_time = times[selected]
+        sel_value = values[selected]
+        range_start = int(bucket * bucket_size) + 1
+        range_end = int((bucket + 1) * bucket_size) + 1
+
+        max_area = -1.0
+        for index in range(range_start, range_end):
+            area = abs(
+                (sel_time - avg_time) * (values[index] - sel_value)
+                - (sel_time - times[index]) * (avg_value - sel_value)
+            )
+            if area > max_area:
+                max_area = area
+                selected_next = index
+
+        selected = selected_next
+        out_times.append(times[selected])
+        out_values.append(values[selected])
+
+    out_times.append(times[size - 1])
+    out_values.append(values[size - 1])
+    return out_times, out_values
@@ -0,0 +1,249 @@
+"""Append-only journal of changed buckets for Energy Stats integration."""
+
+import asyncio
+import json
+import logging
+from contextlib import suppress
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import STORAGE_DIR
+
+_LOGGER = logging.getLogger(__name__)
+
+JOURNAL_KEY = "energy_stats_journal"
+# Size (bytes) from which the snapshot is written and the journal started over
+JOURNAL_COMPACT_SIZE = 512 * 1024
+
+
+def journal_path(hass: HomeAssistant, entry_id: str) -> Path:
+    """Return the journal file path of a config entry."""
+    return Path(hass.config.path(STORAGE_DIR, f"{JOURNAL_KEY}_{entry_id}"))
+
+
+def rotated_path(path: Path) -> Path:
+    """Return the path of a journal file replaced until the snapshot is written."""
+    return path.with_name(f"{path.name}.old")
+
+
+def remove_journal(path: Path) -> None:
+    """Delete the files of a journal."""
+    path.unlink(missing_ok=True)
+    rotated_path(path).unlink(missing_ok=True)
+
+
+class EnergyStatsJournal:
+    """
+    Line based journal of the values changed per update.
+
+    Every line holds a sequence number followed by space separated tokens:
+    ``bucket.key=value`` for entries of dict buckets, ``bucket=value`` for
+    scalar buckets and ``-bucket`` when keys were removed from a dict bucket
+    (e.g. by the daily reset), after which the full bucket follows. Values are
+    JSON and absolute, so replaying a line twice is harmless.
+
+    On compaction the file is replaced by a new one before the snapshot is
+    written, and deleted once the snapshot is saved. Until then both files
+    are replayed, lines up to the sequence number of the snapshot are skipped.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the journal of the provided config entry."""
+        self._hass = hass
+        self._path = journal_path(hass, entry_id)
+        self._rotated = rotated_path(self._path)
+        self.seq = 0
+        # Bytes replayed on the next start
+        self.size = 0
+        self._last: dict[str, Any] = {}
+        self._pending: list[str] = []
+        self._writer: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    async def async_replay(self, data: dict[str, Any]) -> dict[str, Any]:
+        """
+        Apply the journal lines written after the snapshot to its data.
+
+        A line torn by a crash is removed from the file, so the next append
+        starts on a new line. Lines that cannot be parsed are skipped.
+        """
+        snapshot_seq = int(data.get("journal_seq", 0))
+        lines = await self._hass.async_add_executor_job(self._read)
+        self.size = sum(len(line) + 1 for line in lines)
+        self.seq, replayed = replay_lines(data, lines, snapshot_seq)
+        _LOGGER.debug("Replayed %d journal lines up to %d", replayed, self.seq)
+
+        self._last = {
+            bucket: dict(value) if isinstance(value, dict) else value
+            for bucket, value in data.items()
+        }
+        return data
+
+    @callback
+    def async_append(self, buckets: dict[str, Any]) -> None:
+        """Append the values that changed since the last append."""
+        tokens = self._diff(buckets)
+        if not tokens:
+            return
+        self.seq += 1
+        line = f"{self.seq} {' '.join(tokens)}\n"
+        self.size += len(line)
+        self._pending.append(line)
+        if self._writer is None:
+            self._writer = self._hass.async_create_task(
+                self._async_write_pending(), "energy_stats journal write"
+            )
+
+    @property
+    def compaction_due(self) -> bool:
+        """Return if the journal grew large enough to write the snapshot."""
+        return self.size >= JOURNAL_COMPACT_SIZE
+
+    async def async_rotate(self) -> None:
+        """Continue in a new file, keeping the current one until the snapshot."""
+        async with self._lock:
+            await self._hass.async_add_executor_job(self._rotate)
+            self.size = 0
+
+    async def async_drop_rotated(self) -> None:
+        """Delete the file replaced by async_rotate once the snapshot is saved."""
+        async with self._lock:
+            await self._hass.async_add_executor_job(
+                partial(self._rotated.unlink, missing_ok=True)
+            )
+
+    def _diff(self, buckets: dict[str, Any]) -> list[str]:
+        tokens = []
+        for bucket, value in buckets.items():
+            if isinstance(value, dict):
+                last = self._last.setdefault(bucket, {})
+                if last.keys() - value.keys():
+                    tokens.append(f"-{bucket}")
+                    last.clear()
+                for key, val in value.items():
+                    if last.get(key) != val:
+                        last[key] = val
+                        tokens.append(encode_token(bucket, key, val))
+            elif self._last.get(bucket) != value:
+                self._last[bucket] = value
+                tokens.append(encode_token(bucket, None, value))
+        return tokens
+
+    async def _async_write_pending(self) -> None:
+        async with self._lock:
+            while self._pending:
+                chunk = "".join(self._pending)
+                self._pending.clear()
+                try:
+                    await self._hass.async_add_executor_job(self._write, chunk)
+                except OSError:
+                    _LOGGER.exception("Error while writing journal")
+            self._writer = None
+
+    def _write(self, chunk: str) -> None:
+        with self._path.open("a", encoding="utf-8") as file:
+            file.write(chunk)
+
+    def _read(self) -> list[str]:
+        return read_lines(self._rotated) + read_lines(self._path)
+
+    def _rotate(self) -> None:
+        if self._rotated.exists():
+            # The last snapshot failed, its lines are still needed
+            return
+        with suppress(FileNotFoundError):
+            self._path.replace(self._rotated)
+
+
+def read_lines(path: Path) -> list[str]:
+    """Return the complete lines of a journal, removing a torn last line."""
+    try:
+        with path.open(encoding="utf-8") as file:
+            content = file.read()
+    except FileNotFoundError:
+        return []
+    if content and not content.endswith("\n"):
+        # Drop the line torn by a crash, so the next append starts a line
+        _LOGGER.warning("Removing the torn last line of the journal")
+        _replace(path, content[: content.rfind("\n") + 1])
+    return content.split("\n")[:-1]
+
+
+def replay_lines(
+    data: dict[str, Any], lines: list[str], snapshot_seq: int
+) -> tuple[int, int]:
+    """
+    Apply the lines after the snapshot to its data.
+
+    Returns the highest sequence number found, at least the one of the
+    snapshot, and the number of lines applied. Lines that cannot be parsed
+    are skipped.
+    """
+    seq = snapshot_seq
+    replayed = 0
+    for line in lines:
+        seq_str, _, tokens = line.partition(" ")
+        try:
+            line_seq = int(seq_str)
+        except ValueError:
+            _LOGGER.warning("Skipping journal line without sequence: %s", line)
+            continue
+        # Sequence numbers are never reused, even of skipped lines
+        seq = max(seq, line_seq)
+        if line_seq <= snapshot_seq:
+            continue
+        try:
+            changes = [_parse_token(token) for token in tokens.split()]
+        except ValueError:
+            _LOGGER.warning("Skipping unreadable journal line %d", line_seq)
+            continue
+        for bucket, key, value in changes:
+            _apply_change(data, bucket, key, value)
+        replayed += 1
+    return seq, replayed
+
+
+def _replace(path: Path, content: str) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as file:
+        file.write(content)
+    tmp_path.replace(path)
+
+
+def encode_token(bucket: str, key: str | None, value: Any) -> str:
+    """Return the token of a value of a dict bucket, or of a scalar bucket."""
+    # Compact JSON has spaces only within strings, escaped they keep the token
+    raw = json.dumps(value, separators=(",", ":")).replace(" ", "\\u0020")
+    if key is None:
+        return f"{bucket}={raw}"
+    return f"{bucket}.{key}={raw}"
+
+
+def _parse_token(token: str) -> tuple[str, str | None, Any]:
+    """Return bucket, key and value of a token, raise ValueError if invalid."""
+    if token.startswith("-"):
+        return token[1:], None, None
+    name, sep, raw = token.partition("=")
+    bucket, _, key = name.partition(".")
+    if not sep or not bucket or not raw:
+        msg = f"Invalid journal token {token}"
+        raise ValueError(msg)
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        # Written before values were JSON
+        value = raw
+    return bucket, key, value
+
+
+def _apply_change(
+    data: dict[str, Any], bucket: str, key: str | None, value: Any
+) -> None:
+    if key is None:
+        data[bucket] = {}
+    elif key:
+        data.setdefault(bucket, {})[key] = value
+    else:
+        data[bucket] = value
@@ -0,0 +1,139 @@
+"""Hot-path instrumentation for Energy Stats integration."""
+
+import bisect
+from collections import Counter
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+# Upper bounds (seconds) of the histogram buckets, the last bucket is open
+DURATION_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+class DurationHistogram:
+    """Fixed bucket histogram of durations in seconds."""
+
+    __slots__ = ("buckets", "count", "last", "max", "total")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Add one duration."""
+        self.buckets[bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, fraction: float) -> float:
+        """Return the upper bound of the bucket holding a quantile."""
+        rank = fraction * self.count
+        seen = 0
+        for pos, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return (
+                    DURATION_BUCKETS[pos] if pos < len(DURATION_BUCKETS) else self.max
+                )
+        return 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram in milliseconds for diagnostics."""
+        bounds = [f"<={bound * 1000:g}" for bound in DURATION_BUCKETS] + [
+            f">{DURATION_BUCKETS[-1] * 1000:g}"
+        ]
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else None,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "max_ms": self.max * 1000,
+            "last_ms": self.last * 1000,
+            "buckets_ms": dict(zip(bounds, self.buckets, strict=True)),
+        }
+
+
+class EnergyStatsMetrics:
+    """
+    Counters and timings of one coordinator.
+
+    Only created when instrumentation is enabled, callers skip recording when
+    the coordinator has no metrics.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty metrics."""
+        self.started = dt_util.utcnow()
+        self.update_duration = DurationHistogram()
+        self.save_duration = DurationHistogram()
+        self.saved_bytes = 0
+        # Entity id -> updates that failed because it was not ready
+        self.failures: Counter[str] = Counter()
+        self.last_failure: dict[str, str] = {}
+        self.requests: dict[str, DurationHistogram] = {}
+
+    def observe_failure(self, entity_id: str) -> None:
+        """Count an update that failed on an entity."""
+        self.failures[entity_id] += 1
+        self.last_failure[entity_id] = dt_util.utcnow().isoformat()
+
+    def observe_save(self, seconds: float, size: int) -> None:
+        """Add one write of the Store."""
+        self.save_duration.observe(seconds)
+        self.saved_bytes += size
+
+    def observe_request(self, view: str, seconds: float) -> None:
+        """Add one handled API request."""
+        histogram = self.requests.get(view)
+        if histogram is None:
+            histogram = self.requests[view] = DurationHistogram()
+        histogram.observe(seconds)
+
+    def sensor_values(self) -> dict[str, float]:
+        """Return the values of the diagnostic sensors, see METRIC_VALUES."""
+        return {
+            "update_duration": self.update_duration.last * 1000,
+            "update_duration_p95": self.update_duration.quantile(0.95) * 1000,
+            "save_duration": self.save_duration.last * 1000,
+            "saved_bytes": self.saved_bytes,
+            "failed_updates": sum(self.failures.values()),
+            "api_requests": sum(
+                histogram.count for histogram in self.requests.values()
+            ),
+        }
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics for diagnostics."""
+        return {
+            "since": self.started.isoformat(),
+            "update_duration": self.update_duration.as_dict(),
+            "save_duration": self.save_duration.as_dict(),
+            "saved_bytes": self.saved_bytes,
+            "failures": {
+                entity_id: {"count": count, "last": self.last_failure[entity_id]}
+                for entity_id, count in self.failures.items()
+            },
+            "requests": {
+                view: histogram.as_dict() for view, histogram in self.requests.items()
+            },
+        }
@@ -0,0 +1,102 @@
+"""Entity value readers for Energy Stats integration."""
+
+import logging
+from collections.abc import Mapping
+
+from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
+    STATE_OFF,
+    STATE_ON,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    UnitOfEnergy,
+    UnitOfPower,
+)
+from homeassistant.core import State, StateMachine
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util.unit_conversion import (
+    BaseUnitConverter,
+    EnergyConverter,
+    PowerConverter,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Sensor kind (see SENSOR_KEYS) -> converter and the unit values are read in
+CONVERTERS: dict[str, tuple[type[BaseUnitConverter], str]] = {
+    "power": (PowerConverter, UnitOfPower.WATT),
+    "energy": (EnergyConverter, UnitOfEnergy.WATT_HOUR),
+    "energy_storage": (EnergyConverter, UnitOfEnergy.WATT_HOUR),
+}
+
+# Spellings accepted before the converters were used
+UNIT_ALIASES = {
+    "kw": UnitOfPower.KILO_WATT,
+    "kwatt": UnitOfPower.KILO_WATT,
+    "kilowatt": UnitOfPower.KILO_WATT,
+    "kwh": UnitOfEnergy.KILO_WATT_HOUR,
+    "kwhours": UnitOfEnergy.KILO_WATT_HOUR,
+    "kilowatt-hour": UnitOfEnergy.KILO_WATT_HOUR,
+    "kilowatt hour": UnitOfEnergy.KILO_WATT_HOUR,
+}
+
+
+class EntityReader:
+    """
+    Reader of one configured entity.
+
+    Numeric states are converted to W or Wh. The conversion factor is cached
+    and only derived again when the unit attribute changes.
+    """
+
+    __slots__ = ("_base_unit", "_converter", "_factor", "_unit", "entity_id")
+
+    def __init__(self, entity_id: str, kind: str) -> None:
+        """Initialize the reader for an entity of the provided sensor kind."""
+        self.entity_id = entity_id
+        self._converter, self._base_unit = CONVERTERS.get(kind, (None, None))
+        self._unit: str | None = None
+        self._factor = 1.0
+
+    def read(
+        self, states: StateMachine | Mapping[str, State | None]
+    ) -> float | bool | None:
+        """Return the current value, or None if it is not available."""
+        st = states.get(self.entity_id)
+        if st is None or st.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            return None
+        try:
+            value = float(st.state)
+        except ValueError:
+            if st.state == STATE_ON:
+                return True
+            if st.state == STATE_OFF:
+                return False
+            return None
+
+        if self._converter is not None:
+            unit = st.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+            if unit != self._unit:
+                self._unit = unit
+                self._factor = self._derive_factor(unit)
+            value *= self._factor
+        return value
+
+    def _derive_factor(self, unit: str | None) -> float:
+        converter = self._converter
+        if unit is None:
+            return 1.0
+        if unit not in converter.VALID_UNITS:
+            unit = UNIT_ALIASES.get(unit.lower(), unit)
+        try:
+            factor = converter.get_unit_ratio(self._base_unit, unit)
+        except HomeAssistantError:
+            _LOGGER.warning(
+                "Unit %s of %s is not supported, using its values as %s",
+                unit,
+                self.entity_id,
+                self._base_unit,
+            )
+            return 1.0
+        _LOGGER.debug("Unit of %s is %s, factor %s", self.entity_id, unit, factor)
+        return factor
@@ -0,0 +1,196 @@
+"""Hourly, weekly, monthly and yearly rollups for Energy Stats integration."""
+
+from datetime import UTC, date, datetime, time, timedelta, tzinfo
+
+PERIODS = ("week", "month", "year")
+
+
+def reset_at(day: date, reset: time, tz: tzinfo) -> datetime:
+    """
+    Return the daily reset of a local day in UTC.
+
+    Days are stepped as local dates, so a reset keeps its local time across
+    DST changes. A reset in a skipped hour moves an hour later, in a repeated
+    hour it happens at the first occurrence.
+    """
+    return datetime.combine(day, reset, tzinfo=tz).astimezone(UTC)
+
+
+def period_start(now: datetime, reset: time, tz: tzinfo) -> datetime:
+    """Return the last daily reset at or before now."""
+    day = now.astimezone(tz).date()
+    start = reset_at(day, reset, tz)
+    if start > now:
+        start = reset_at(day - timedelta(days=1), reset, tz)
+    return start
+
+
+def reset_after(now: datetime, reset: time, tz: tzinfo) -> datetime:
+    """Return the first daily reset after now."""
+    day = now.astimezone(tz).date()
+    after = reset_at(day, reset, tz)
+    if after <= now:
+        after = reset_at(day + timedelta(days=1), reset, tz)
+    return after
+
+
+def period_id(period: str, day: date) -> int:
+    """Return the number identifying the week, month or year of a day."""
+    if period == "week":
+        # Ordinal of the Monday
+        return day.toordinal() - day.weekday()
+    if period == "month":
+        return day.year * 12 + day.month - 1
+    return day.year
+
+
+def period_label(period: str, pid: int) -> str:
+    """Return the ISO representation of the start of a period."""
+    if period == "hour":
+        return datetime.fromtimestamp(pid * 3600, UTC).isoformat()
+    if period == "week":
+        return date.fromordinal(pid).isoformat()
+    if period == "month":
+        return f"{pid // 12}-{pid % 12 + 1:02d}"
+    return str(pid)
+
+
+class RollupTree:
+    """
+    Energies of the hours of the current day and of the open periods.
+
+    Closed hours are kept as ``hour_<id>`` until the day ends, with the id
+    counting hours since the Unix epoch, so hours stay unique across DST. A
+    finished day is added to its week and month, a finished month to its
+    year, each in a single step, and the periods left are kept as ``last_*``.
+    Values of an open period are its buckets plus the running day, so nothing
+    has to be summed over history.
+
+    All buckets are flat dicts of Wh and persisted as one flat dict of floats,
+    ``<bucket>:<key>``, with the identity of each bucket in ``<bucket>:id``.
+    """
+
+    def __init__(self, stored: dict[str, float] | None = None) -> None:
+        """Initialize the tree, optionally from its persisted form."""
+        self.buckets: dict[str, dict[str, float]] = {}
+        self.ids: dict[str, int] = {}
+        for name, value in (stored or {}).items():
+            bucket, _, key = name.partition(":")
+            if key == "id":
+                self.ids[bucket] = int(value)
+            else:
+                self.buckets.setdefault(bucket, {})[key] = value
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the persisted form of the tree."""
+        data = {f"{bucket}:id": float(pid) for bucket, pid in self.ids.items()}
+        for bucket, sums in self.buckets.items():
+            data.update((f"{bucket}:{key}", value) for key, value in sums.items())
+        return data
+
+    def start_day(self, day: date) -> bool:
+        """Open the periods of a day, return if any period was left."""
+        changed = False
+        for period in PERIODS:
+            pid = period_id(period, day)
+            if self.ids.get(period) == pid:
+                continue
+            if period == "month" and "month" in self.ids:
+                # The finished month still belongs to the open year
+                self._add("year", self.buckets.get("month", {}))
+            self._rotate(period, pid)
+            changed = True
+        return changed
+
+    def close_day(self, day: date, totals: dict[str, float], next_day: date) -> None:
+        """Fold the totals of a finished day into its periods."""
+        self.start_day(day)
+        self._add("week", totals)
+        self._add("month", totals)
+        for bucket in [bucket for bucket in self.buckets if bucket.startswith("hour_")]:
+            del self.buckets[bucket]
+        # The running hour starts over with the day
+        self.buckets["hour"] = {}
+        self.start_day(next_day)
+
+    def update_hour(self, hour_id: int, totals: dict[str, float]) -> bool:
+        """Close the running hour once a new one started, return if it did."""
+        current = self.ids.get("hour")
+        if current == hour_id:
+            return False
+        if current is not None and current < hour_id:
+            base = self.buckets.get("hour", {})
+            self.buckets[f"hour_{current}"] = self._difference(totals, base)
+        self.ids["hour"] = hour_id
+        self.buckets["hour"] = dict(totals)
+        return True
+
+    def replace_hours(
+        self,
+        hours: dict[int, dict[str, float]],
+        totals: dict[str, float],
+        running: int | None = None,
+    ) -> None:
+        """
+        Replace the energies of the hours of the day, e.g. recomputed ones.
+
+        The running hour stays the same unless another one is provided.
+        """
+        for bucket in [bucket for bucket in self.buckets if bucket.startswith("hour_")]:
+            del self.buckets[bucket]
+        if running is not None:
+            self.ids["hour"] = running
+        running = self.ids.get("hour")
+        for hour_id, energies in hours.items():
+            if hour_id != running and energies:
+                self.buckets[f"hour_{hour_id}"] = dict(energies)
+        current = hours.get(running, {})
+        self.buckets["hour"] = {
+            key: value - current.get(key, 0.0) for key, value in totals.items()
+        }
+
+    def hours(self, totals: dict[str, float]) -> dict[int, dict[str, float]]:
+        """Return the energies of all hours of the day, including the running one."""
+        hours = {
+            int(bucket.removeprefix("hour_")): sums
+            for bucket, sums in self.buckets.items()
+            if bucket.startswith("hour_")
+        }
+        if "hour" in self.ids:
+            hours[self.ids["hour"]] = self._difference(
+                totals, self.buckets.get("hour", {})
+            )
+        return dict(sorted(hours.items()))
+
+    def totals(self, period: str, totals: dict[str, float]) -> dict[str, float]:
+        """Return the energies of an open period, including the running day."""
+        sums = dict(totals)
+        parts = [self.buckets.get(period, {})]
+        if period == "year":
+            parts.append(self.buckets.get("month", {}))
+        for part in parts:
+            for key, value in part.items():
+                sums[key] = sums.get(key, 0.0) + value
+        return sums
+
+    def _add(self, bucket: str, values: dict[str, float]) -> None:
+        sums = self.buckets.setdefault(bucket, {})
+        for key, value in values.items():
+            sums[key] = sums.get(key, 0.0) + value
+
+    def _rotate(self, period: str, pid: int) -> None:
+        if period in self.ids:
+            self.buckets[f"last_{period}"] = self.buckets.get(period, {})
+            self.ids[f"last_{period}"] = self.ids[period]
+        self.buckets[period] = {}
+        self.ids[period] = pid
+
+    @staticmethod
+    def _difference(
+        totals: dict[str, float], base: dict[str, float]
+    ) -> dict[str, float]:
+        return {
+            key: value - base.get(key, 0.0)
+            for key, value in totals.items()
+            if value - base.get(key, 0.0) > 0
+        }
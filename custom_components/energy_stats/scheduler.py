@@ -0,0 +1,56 @@
+"""Adaptive update interval for Energy Stats integration."""
+
+from datetime import timedelta
+
+# Power roles that are integrated between updates
+INTEGRATED_POWERS = ("grid_power", "pv_power", "battery_power", "car_charging_power")
+
+
+class AdaptiveInterval:
+    """
+    Update interval that follows the volatility of the integrated powers.
+
+    Between two samples the trapezoidal rule is off by at most half the power
+    change times the interval. With the power changing at ``r`` W/s, keeping
+    that error below ``max_error`` Wh per hour of integration requires an
+    interval of at most ``2 * max_error / r`` seconds. The interval shrinks
+    immediately and grows by at most a factor of two per update, so a single
+    quiet sample does not jump to the maximum.
+    """
+
+    def __init__(
+        self, min_interval: float, max_interval: float, max_error: float
+    ) -> None:
+        """Initialize with bounds in seconds and the error bound in Wh/h."""
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.max_error = max_error
+        self.interval = min_interval
+        self._last_powers: dict[str, float] = {}
+
+    def next(
+        self, powers: dict[str, float | None], elapsed: float, *, active: bool
+    ) -> timedelta:
+        """
+        Return the interval until the next update.
+
+        Active loads like a connected car keep the minimum interval.
+        """
+        rate = 0.0
+        for key in INTEGRATED_POWERS:
+            power = powers.get(key)
+            if power is None:
+                continue
+            last = self._last_powers.get(key)
+            self._last_powers[key] = power
+            if last is not None and elapsed > 0:
+                rate = max(rate, abs(power - last) / elapsed)
+
+        if active:
+            interval = self.min_interval
+        elif rate > 0:
+            interval = min(2 * self.max_error / rate, 2 * self.interval)
+        else:
+            interval = 2 * self.interval
+        self.interval = max(self.min_interval, min(self.max_interval, interval))
+        return timedelta(seconds=self.interval)
@@ -1,17 +1,28 @@
 """Sensor handling for Energy Stats integration."""
 
 import logging
+import time
 from collections.abc import Callable
 from datetime import date, datetime
 from decimal import Decimal
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.typing import StateType
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import CALCULATED_VALUES, DOMAIN
+from .const import (
+    CALCULATED_VALUES,
+    CONF_MAX_STALENESS,
+    DEFAULT_MAX_STALENESS,
+    DOMAIN,
+    METRIC_VALUES,
+    METRIC_WRITE_THRESHOLD,
+    WRITE_THRESHOLDS,
+)
 from .coordinator import EnergyStatsCoordinator
 
 _LOGGER = logging.getLogger(__name__)
@@ -27,28 +38,149 @@ async def async_setup_entry(
     coordinator = hass.data[DOMAIN][entry.entry_id]
 
     entities: list[SensorEntity] = []
-    for key in coordinator.data["calculated_keys"]:
+    for key in coordinator.calculated_keys:
         _LOGGER.debug("Creating sensor for %s", key)
         entity = EnergyStatsSensor(coordinator, key)
         entities.append(entity)
 
+    for key, entity_id in coordinator.breakdown_keys.items():
+        state = hass.states.get(entity_id)
+        name = state.name if state else entity_id
+        entities.append(
+            EnergyStatsSensor(
+                coordinator, key, [f"Daily {name} Energy", "energy", "total", "Wh"]
+            )
+        )
+
+    if coordinator.metrics is not None:
+        entities.extend(
+            EnergyStatsMetricSensor(coordinator, key) for key in METRIC_VALUES
+        )
+
     async_add_entities(entities)
 
 
-class EnergyStatsSensor(CoordinatorEntity, SensorEntity):
-    """Class for Energy Stats sensors."""
+class ThrottledSensor(CoordinatorEntity, SensorEntity):
+    """
+    Base class of sensors that skip insignificant state writes.
 
-    def __init__(self, coordinator: EnergyStatsCoordinator, key: str) -> None:
-        """Initialize a new sensor for the provided key."""
+    The state is only written when the value moved by more than the threshold
+    since the last write, or when a smaller change has been pending for the
+    maximum staleness.
+    """
+
+    def __init__(
+        self,
+        coordinator: EnergyStatsCoordinator,
+        threshold: tuple[float, float],
+    ) -> None:
+        """Initialize the write throttling with an (absolute, relative) threshold."""
         super().__init__(coordinator)
         self.coordinator = coordinator
+        max_staleness = coordinator.entry.data.get(CONF_MAX_STALENESS)
+        self._max_staleness = float(
+            DEFAULT_MAX_STALENESS if max_staleness is None else max_staleness
+        )
+        self._threshold = threshold
+        self._written_value: float | None = None
+        self._written_available = False
+        self._written_at = 0.0
+        self._unsub_stale: CALLBACK_TYPE | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Remember the initially written state."""
+        await super().async_added_to_hass()
+        self._remember_written()
+        self.async_on_remove(self._cancel_stale)
+
+    def _value_changed(self) -> bool:
+        """Return if the value may have changed in the latest update."""
+        return True
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if the change is significant or overdue."""
+        available = self.available
+        if available == self._written_available and (
+            not available or not self._value_changed()
+        ):
+            return
+
+        value = self.native_value
+        if (
+            self._max_staleness > 0
+            and available == self._written_available
+            and self._within_threshold(value)
+            and time.monotonic() - self._written_at < self._max_staleness
+        ):
+            if self._unsub_stale is None:
+                self._unsub_stale = async_call_later(
+                    self.hass,
+                    self._max_staleness - (time.monotonic() - self._written_at),
+                    self._write_stale,
+                )
+            return
+
+        self.async_write_ha_state()
+        self._remember_written()
+
+    @callback
+    def _write_stale(self, _now: datetime) -> None:
+        self._unsub_stale = None
+        self.async_write_ha_state()
+        self._remember_written()
+
+    @callback
+    def _cancel_stale(self) -> None:
+        if self._unsub_stale is not None:
+            self._unsub_stale()
+            self._unsub_stale = None
+
+    def _remember_written(self) -> None:
+        self._cancel_stale()
+        self._written_available = self.available
+        self._written_value = self.native_value if self._written_available else None
+        self._written_at = time.monotonic()
+
+    def _within_threshold(self, value: float | None) -> bool:
+        written = self._written_value
+        if value is None or written is None:
+            return value is written
+        absolute, relative = self._threshold
+        return abs(value - written) < max(absolute, relative * abs(written))
+
+
+class EnergyStatsSensor(ThrottledSensor):
+    """
+    Class for Energy Stats sensors.
+
+    Written with the threshold of their device class, and only when their
+    key changed in the latest update.
+    """
+
+    def __init__(
+        self,
+        coordinator: EnergyStatsCoordinator,
+        key: str,
+        description: list | None = None,
+    ) -> None:
+        """Initialize a new sensor, described by CALCULATED_VALUES by default."""
+        description = description or CALCULATED_VALUES[key]
+        super().__init__(
+            coordinator, WRITE_THRESHOLDS.get(description[1], WRITE_THRESHOLDS[None])
+        )
         self._key = key
         self._attr_unique_id = f"{coordinator.entry_id}_{key}"
-        self._attr_name = f"{CALCULATED_VALUES[key][0]}"
-        self._attr_native_unit_of_measurement = CALCULATED_VALUES[key][3]
-        self._attr_device_class = CALCULATED_VALUES[key][1]
-        self._attr_state_class = CALCULATED_VALUES[key][2]
+        self._attr_name = f"{description[0]}"
+        self._attr_native_unit_of_measurement = description[3]
+        self._attr_device_class = description[1]
+        self._attr_state_class = description[2]
         self._attr_suggested_display_precision = 2
+        if self._attr_device_class == "monetary":
+            self._attr_native_unit_of_measurement = coordinator.hass.config.currency
+
+    def _value_changed(self) -> bool:
+        return self._key in self.coordinator.changed_keys
 
     @property
     def native_value(self) -> StateType | date | datetime | Decimal | None:
@@ -59,3 +191,30 @@ class EnergyStatsSensor(CoordinatorEntity, SensorEntity):
     def available(self) -> bool:
         """Return if the sensor is available."""
         return super().available and (self._key in self.coordinator.data)
+
+
+class EnergyStatsMetricSensor(ThrottledSensor):
+    """Class for diagnostic sensors of the instrumentation."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator: EnergyStatsCoordinator, key: str) -> None:
+        """Initialize a new sensor for the provided metric."""
+        super().__init__(coordinator, METRIC_WRITE_THRESHOLD)
+        self._key = key
+        self._attr_unique_id = f"{coordinator.entry_id}_metric_{key}"
+        self._attr_name = f"{METRIC_VALUES[key][0]}"
+        self._attr_native_unit_of_measurement = METRIC_VALUES[key][3]
+        self._attr_device_class = METRIC_VALUES[key][1]
+        self._attr_state_class = METRIC_VALUES[key][2]
+        self._attr_suggested_display_precision = 2
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the current value of the metric."""
+        return self.coordinator.metrics.sensor_values()[self._key]
+
+    @property
+    def available(self) -> bool:
+        """Return True, metrics are also of interest while updates fail."""
+        return True
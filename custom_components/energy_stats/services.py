@@ -0,0 +1,78 @@
+"""Services of Energy Stats integration."""
+
+import logging
+
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .coordinator import EnergyStatsCoordinator
+from .tariffs import TARIFF_ROLES
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_SET_PRICES = "set_prices"
+SERVICE_RECOMPUTE = "recompute"
+ATTR_ENTRY_ID = "entry_id"
+ATTR_TARIFF = "tariff"
+ATTR_PRICES = "prices"
+
+SET_PRICES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTRY_ID): cv.string,
+        vol.Required(ATTR_TARIFF): vol.In(list(TARIFF_ROLES)),
+        vol.Required(ATTR_PRICES): [
+            {
+                vol.Required("start"): cv.datetime,
+                vol.Required("price"): vol.Coerce(float),
+            }
+        ],
+    }
+)
+RECOMPUTE_SCHEMA = vol.Schema({vol.Optional(ATTR_ENTRY_ID): cv.string})
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services once for all config entries."""
+    if hass.services.has_service(DOMAIN, SERVICE_SET_PRICES):
+        return
+    _LOGGER.debug("Executing async_setup_services...")
+
+    @callback
+    def coordinators_for(call: ServiceCall) -> list[EnergyStatsCoordinator]:
+        """Return the coordinator of the requested entry, all by default."""
+        coordinators = hass.data.get(DOMAIN) or {}
+        entry_id = call.data.get(ATTR_ENTRY_ID)
+        if entry_id is None:
+            return list(coordinators.values())
+        if entry_id not in coordinators:
+            msg = f"Unknown entry {entry_id}"
+            raise ServiceValidationError(msg)
+        return [coordinators[entry_id]]
+
+    @callback
+    def set_prices(call: ServiceCall) -> None:
+        """Load or correct a price schedule and price the running day again."""
+        coordinators = coordinators_for(call)
+        points = [
+            (dt_util.as_utc(point["start"]).timestamp(), point["price"])
+            for point in call.data[ATTR_PRICES]
+        ]
+        for coordinator in coordinators:
+            coordinator.async_set_prices(call.data[ATTR_TARIFF], points)
+
+    async def recompute(call: ServiceCall) -> None:
+        """Integrate the closed hours of the running day again."""
+        for coordinator in coordinators_for(call):
+            await coordinator.async_recompute()
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_PRICES, set_prices, schema=SET_PRICES_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_RECOMPUTE, recompute, schema=RECOMPUTE_SCHEMA
+    )
@@ -0,0 +1,240 @@
+"""Car charging sessions for Energy Stats integration."""
+
+import bisect
+from array import array
+from datetime import UTC, datetime
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .calculations import trapezoid
+
+SESSIONS_VERSION = 1
+SESSIONS_KEY = "energy_stats_sessions"
+# Seconds to coalesce writes of closed sessions
+SESSIONS_SAVE_DELAY = 10
+
+# Charging power (W) above which a session without plug sensor is active
+SESSION_MIN_POWER = 50.0
+# Seconds below that power after which such a session ends
+SESSION_IDLE_TIME = 900.0
+# Sessions with less energy (Wh) are not recorded
+SESSION_MIN_ENERGY = 1.0
+
+# Fields of a stored session record, in order
+SESSION_FIELDS = (
+    "start",
+    "end",
+    "energy",
+    "pv_share",
+    "peak_power",
+    "soc_start",
+    "soc_end",
+    "cost",
+)
+
+
+def session_dict(record: list[float | None]) -> dict[str, Any]:
+    """Return the API representation of a session record."""
+    # Records written before the cost was recorded are shorter
+    record = [*record, None][: len(SESSION_FIELDS)]
+    start, end, energy, pv_share, peak_power, soc_start, soc_end, cost = record
+    return {
+        "start": datetime.fromtimestamp(start, UTC).isoformat(),
+        "end": datetime.fromtimestamp(end, UTC).isoformat() if end else None,
+        "energy_wh": energy,
+        "pv_share": pv_share,
+        "peak_power_w": peak_power,
+        "soc_start": soc_start,
+        "soc_end": soc_end,
+        "soc_delta": (
+            soc_end - soc_start
+            if soc_start is not None and soc_end is not None
+            else None
+        ),
+        "cost": cost,
+    }
+
+
+class SessionTracker:
+    """
+    Detection and accumulation of the running charging session.
+
+    With a plug sensor a session lasts while the car is connected. Without
+    one it starts when the charging power exceeds SESSION_MIN_POWER and ends
+    once it stayed below for SESSION_IDLE_TIME. Energies are integrated with
+    the trapezoidal rule, or as steps, from the charging power and from the
+    flows into the car, which give the PV share. Without a charging power the
+    energy is the increase of the charging energy counter. The cost adds up
+    the priced grid energy into the car, see tariffs.py.
+
+    The running session is persisted as a flat dict of floats.
+    """
+
+    def __init__(self, stored: dict[str, float] | None = None) -> None:
+        """Initialize the tracker, optionally with a persisted session."""
+        self.session: dict[str, float] = dict(stored or {})
+        self._last_power: float | None = None
+        self._last_flows: dict[str, float] | None = None
+        self._last_energy: float | None = None
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the persisted form of the running session."""
+        return self.session
+
+    def update(  # noqa: PLR0912, PLR0913
+        self,
+        now: float,
+        elapsed_h: float,
+        *,
+        connected: bool | None,
+        power: float | None,
+        flows: dict[str, float] | None,
+        soc: float | None,
+        battery_pv_share: float,
+        cost: float = 0.0,
+        energy: float | None = None,
+        step: bool = False,
+    ) -> list[float | None] | None:
+        """Add one update, return the record of a session that ended."""
+        counted = self._count_energy(energy)
+        if power is not None:
+            # The power is integrated instead
+            counted = None
+        power = max(0.0, power or 0.0)
+        last_power = self._last_power if self._last_power is not None else power
+        self._last_power = power
+        car_flows = (
+            {source: flows[f"{source}_car"] for source in ("pv", "grid", "battery")}
+            if flows is not None
+            else None
+        )
+        last_flows = self._last_flows or car_flows
+        self._last_flows = car_flows
+
+        session = self.session
+        if connected is None:
+            active = power > SESSION_MIN_POWER
+            if not active and session:
+                active = now - session["last_active"] < SESSION_IDLE_TIME
+        else:
+            active = connected
+
+        record = None
+        if session and not active:
+            record = self._close(battery_pv_share)
+        if not active:
+            return record
+
+        if not session:
+            session.update(start=now, energy=0.0, pv=0.0, grid=0.0, battery=0.0)
+            session["peak"] = 0.0
+            session["cost"] = 0.0
+            if soc is not None:
+                session["soc_start"] = soc
+        if counted is not None:
+            session["energy"] += counted
+        elif elapsed_h > 0:
+            session["energy"] += trapezoid(last_power, power, elapsed_h, step=step)
+        if elapsed_h > 0:
+            if car_flows is not None and last_flows is not None:
+                for source, value in car_flows.items():
+                    session[source] += trapezoid(
+                        last_flows[source], value, elapsed_h, step=step
+                    )
+            session["cost"] = session.get("cost", 0.0) + cost
+        session["peak"] = max(session["peak"], power)
+        if connected or power > SESSION_MIN_POWER or "last_active" not in session:
+            session["last_active"] = now
+        if soc is not None:
+            session.setdefault("soc_start", soc)
+            session["soc_end"] = soc
+        return record
+
+    def _count_energy(self, energy: float | None) -> float | None:
+        """Return the increase of the energy counter since the last update."""
+        last = self._last_energy
+        if energy is None:
+            return None
+        self._last_energy = energy
+        if last is None or energy < last:
+            # First reading or the counter was reset
+            return None
+        return energy - last
+
+    def current(self, battery_pv_share: float) -> list[float | None] | None:
+        """Return the record of the running session, without an end."""
+        if not self.session:
+            return None
+        record = self._record(battery_pv_share)
+        record[1] = None
+        return record
+
+    def _close(self, battery_pv_share: float) -> list[float | None] | None:
+        record = self._record(battery_pv_share)
+        self.session.clear()
+        return record if record[2] >= SESSION_MIN_ENERGY else None
+
+    def _record(self, battery_pv_share: float) -> list[float | None]:
+        session = self.session
+        total = session["pv"] + session["grid"] + session["battery"]
+        pv = session["pv"] + session["battery"] * battery_pv_share
+        return [
+            session["start"],
+            session["last_active"],
+            session["energy"],
+            pv / total if total > 0 else None,
+            session["peak"],
+            session.get("soc_start"),
+            session.get("soc_end"),
+            session.get("cost"),
+        ]
+
+
+class SessionStore:
+    """
+    Closed charging sessions of one config entry, ordered by start.
+
+    The records are kept in memory with a parallel array of their start
+    timestamps, so a time range is found by bisection. They are written to
+    their own Store file, which only changes when a session ends.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the session store of the provided config entry."""
+        self._store = Store(hass, SESSIONS_VERSION, f"{SESSIONS_KEY}_{entry_id}")
+        self.records: list[list[float | None]] = []
+        self._starts = array("d")
+
+    async def async_load(self) -> None:
+        """Load the stored sessions."""
+        stored = await self._store.async_load()
+        self.records = sorted(
+            (stored or {}).get("sessions", []), key=lambda record: record[0]
+        )
+        self._starts = array("d", (record[0] for record in self.records))
+
+    async def async_remove(self) -> None:
+        """Remove the stored sessions."""
+        await self._store.async_remove()
+
+    @callback
+    def async_append(self, record: list[float | None]) -> None:
+        """Add a closed session and schedule a write."""
+        pos = bisect.bisect_right(self._starts, record[0])
+        self.records.insert(pos, record)
+        self._starts.insert(pos, record[0])
+        self._store.async_delay_save(self._data, SESSIONS_SAVE_DELAY)
+
+    def query(
+        self, start: float, end: float, offset: int, limit: int
+    ) -> tuple[list[list[float | None]], int]:
+        """Return a page of the sessions starting in a range and their count."""
+        first = bisect.bisect_left(self._starts, start)
+        last = bisect.bisect_left(self._starts, end)
+        begin = first + offset
+        return self.records[begin : min(begin + limit, last)], max(0, last - first)
+
+    def _data(self) -> dict[str, Any]:
+        return {"fields": SESSION_FIELDS, "sessions": self.records}
@@ -0,0 +1,100 @@
+"""Immutable snapshots of the Energy Stats values."""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any
+
+from homeassistant.helpers.json import json_bytes
+
+
+@dataclass(frozen=True)
+class EnergyStatsSnapshot:
+    """
+    Read-only view of the values of one update.
+
+    The JSON encoding is created on first use and then shared by all readers
+    of this snapshot.
+    """
+
+    etag_prefix: str
+    version: int = 0
+    data: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+    # Version in which each key was last changed or removed
+    key_versions: Mapping[str, int] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    changed_keys: frozenset[str] = frozenset()
+
+    @property
+    def token(self) -> str:
+        """Return the version tagged with the process it was created in."""
+        return f"{self.etag_prefix}-{self.version}"
+
+    @property
+    def etag(self) -> str:
+        """Return the entity tag of this snapshot."""
+        return f'"{self.token}"'
+
+    @cached_property
+    def body(self) -> bytes:
+        """Return the JSON encoded values."""
+        return json_bytes(self.data)
+
+    def changes_since(self, version: int) -> dict[str, Any]:
+        """Return the values changed and the keys removed after a version."""
+        changed = {}
+        removed = []
+        for key, key_version in self.key_versions.items():
+            if key_version <= version:
+                continue
+            if key in self.data:
+                changed[key] = self.data[key]
+            else:
+                removed.append(key)
+        return {
+            "version": self.token,
+            "full": False,
+            "data": changed,
+            "removed": removed,
+        }
+
+    def changes_since_token(self, token: str) -> dict[str, Any]:
+        """
+        Return the changes after the version of a token.
+
+        Versions restart with every process, so a token of another process or
+        of a version not reached yet gets all values with ``full`` set.
+        Raises ValueError for a malformed token.
+        """
+        prefix, _, version = token.rpartition("-")
+        since = int(version)
+        if prefix != self.etag_prefix or since > self.version:
+            return {
+                "version": self.token,
+                "full": True,
+                "data": dict(self.data),
+                "removed": [],
+            }
+        return self.changes_since(since)
+
+    def next(self, values: dict[str, Any]) -> "EnergyStatsSnapshot":
+        """Return the snapshot for new values, or self if nothing changed."""
+        old = self.data
+        changed = {key for key, value in values.items() if old.get(key) != value}
+        changed.update(key for key in old if key not in values)
+        if not changed:
+            return self
+
+        version = self.version + 1
+        key_versions = dict(self.key_versions)
+        for key in changed:
+            key_versions[key] = version
+        return EnergyStatsSnapshot(
+            self.etag_prefix,
+            version,
+            MappingProxyType(dict(values)),
+            MappingProxyType(key_versions),
+            frozenset(changed),
+        )
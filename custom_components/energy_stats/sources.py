@@ -0,0 +1,187 @@
+"""Aggregation of the input entities per role for Energy Stats integration."""
+
+import math
+from array import array
+from collections.abc import Mapping
+
+from homeassistant.core import State, StateMachine
+
+from .calculations import trapezoid
+from .readers import EntityReader
+
+# Sensor kinds (see SENSOR_KEYS) whose roles accept several entities
+MULTI_SOURCE_KINDS = ("power", "energy", "energy_storage")
+# Roles with per-entity daily energies when the breakdown is enabled
+BREAKDOWN_ROLES = ("pv_power", "car_charging_power")
+
+
+def entity_ids(value: str | list[str] | None) -> list[str]:
+    """Return the entities configured for a role, a single one as a list."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def breakdown_key(entity_id: str) -> str:
+    """Return the key of the daily energy of one source entity."""
+    return f"source_{entity_id.replace('.', '_')}"
+
+
+class SourceAggregator:
+    """
+    Readers of all input entities, summed per role in one pass.
+
+    The entities of all roles are kept in flat parallel arrays holding the
+    slot of their role, their scale and their last value and read time. An
+    update walks the arrays once and adds every scaled value to the sum of
+    its role, so its cost only grows with the number of entities.
+
+    A missing entity keeps its last value for ``hold_time`` seconds. After
+    that a power entity is left out of the sum of its role, while any other
+    role is missing as a whole, because a partial sum of energy counters
+    would jump.
+    """
+
+    def __init__(
+        self,
+        roles: dict[str, tuple[str, list[str]]],
+        scales: dict[str, float],
+        hold_time: float,
+    ) -> None:
+        """Initialize with the kind and entities of each role."""
+        self.roles = list(roles)
+        self._kinds = [kind for kind, _ in roles.values()]
+        self._readers: list[EntityReader] = []
+        self._slots = array("i")
+        for slot, (kind, ids) in enumerate(roles.values()):
+            for entity_id in ids:
+                self._readers.append(EntityReader(entity_id, kind))
+                self._slots.append(slot)
+        count = len(self._readers)
+        self._scales = array(
+            "d", (float(scales.get(reader.entity_id, 1.0)) for reader in self._readers)
+        )
+        self._partial = array("b", (kind == "power" for kind in self._kinds))
+        self._hold_time = hold_time
+        self._values = array("d", [0.0]) * count
+        self._read_at = array("d", [-math.inf]) * count
+        self._sums = array("d", [0.0]) * len(self.roles)
+        self._counts = array("i", [0]) * len(self.roles)
+        # Scaled value of every entity in the latest update, NaN if left out
+        self.current = array("d", [math.nan]) * count
+        self.missing: list[str] = []
+
+        # Daily energies of the entities of BREAKDOWN_ROLES
+        self._breakdown = array(
+            "i",
+            (
+                pos
+                for pos, reader in enumerate(self._readers)
+                if self.roles[self._slots[pos]] in BREAKDOWN_ROLES
+            ),
+        )
+        self._last = array("d", [math.nan]) * count
+        self.energies = array("d", [0.0]) * count
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the entities of all roles."""
+        return [reader.entity_id for reader in self._readers]
+
+    def read(
+        self, states: StateMachine | Mapping[str, State | None], now: float
+    ) -> dict[str, float | bool | None]:
+        """Return the sum of each role, None for a missing role."""
+        sums = self._sums
+        counts = self._counts
+        for slot in range(len(sums)):
+            sums[slot] = 0.0
+            counts[slot] = 0
+        values = self._values
+        read_at = self._read_at
+        scales = self._scales
+        slots = self._slots
+        partial = self._partial
+        current = self.current
+        missing = self.missing = []
+
+        for pos, reader in enumerate(self._readers):
+            slot = slots[pos]
+            value = reader.read(states)
+            if value is None:
+                missing.append(reader.entity_id)
+                if now - read_at[pos] > self._hold_time:
+                    current[pos] = math.nan
+                    if not partial[slot]:
+                        sums[slot] = math.nan
+                    continue
+                value = values[pos]
+            else:
+                values[pos] = value
+                read_at[pos] = now
+            current[pos] = value * scales[pos]
+            sums[slot] += current[pos]
+            counts[slot] += 1
+
+        result: dict[str, float | bool | None] = {}
+        for slot, role in enumerate(self.roles):
+            total = sums[slot]
+            if not counts[slot] or math.isnan(total):
+                result[role] = None
+            elif self._kinds[slot] == "plug":
+                result[role] = total > 0
+            else:
+                result[role] = total
+        return result
+
+    def integrate(self, elapsed_h: float, *, step: bool = False) -> bool:
+        """Add the energies of the breakdown entities, return if any changed."""
+        changed = False
+        current = self.current
+        last = self._last
+        energies = self.energies
+        for pos in self._breakdown:
+            power = current[pos]
+            if not math.isnan(power):
+                power = max(0.0, power)
+            previous = last[pos]
+            last[pos] = power
+            if math.isnan(power) or math.isnan(previous) or elapsed_h <= 0:
+                continue
+            energy = trapezoid(previous, power, elapsed_h, step=step)
+            if energy > 0:
+                energies[pos] += energy
+                changed = True
+        return changed
+
+    def breakdown(self) -> dict[str, float]:
+        """Return the daily energy of every breakdown entity."""
+        readers = self._readers
+        energies = self.energies
+        return {
+            breakdown_key(readers[pos].entity_id): energies[pos]
+            for pos in self._breakdown
+        }
+
+    def breakdown_entities(self) -> list[str]:
+        """Return the entities with a daily energy."""
+        return [self._readers[pos].entity_id for pos in self._breakdown]
+
+    def load_energies(self, stored: dict[str, float] | None) -> None:
+        """Restore the daily energies persisted by entity."""
+        stored = stored or {}
+        for pos, reader in enumerate(self._readers):
+            self.energies[pos] = stored.get(reader.entity_id, 0.0)
+
+    def energies_by_entity(self) -> dict[str, float]:
+        """Return the persisted form of the daily energies."""
+        readers = self._readers
+        energies = self.energies
+        return {readers[pos].entity_id: energies[pos] for pos in self._breakdown}
+
+    def reset(self) -> None:
+        """Start a new day, keeping the last powers for the next integration."""
+        for pos in self._breakdown:
+            self.energies[pos] = 0.0
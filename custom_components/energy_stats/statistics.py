@@ -0,0 +1,160 @@
+"""Long-term statistics emitted directly by Energy Stats integration."""
+
+import logging
+from datetime import UTC, datetime
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import (
+    StatisticData,
+    StatisticMeanType,
+    StatisticMetaData,
+)
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import HomeAssistant, callback
+
+from .const import CALCULATED_VALUES, DOMAIN, ROLLUP_NAMES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def hour_start(hour_id: int) -> datetime:
+    """Return the start of an hour counted since the epoch in UTC."""
+    return datetime.fromtimestamp(hour_id * 3600, UTC)
+
+
+def statistic_name(key: str) -> str:
+    """Return the name of the statistic of a rolled up energy or flow cell."""
+    if key in ROLLUP_NAMES:
+        return ROLLUP_NAMES[key]
+    return CALCULATED_VALUES[f"flow_{key}"][0].removeprefix("Daily ")
+
+
+class StatisticsWriter:
+    """
+    Hourly external statistics of the rolled up energies and flow cells.
+
+    Closed hours are taken from the rollups and imported in one batch per
+    statistic, continuing the cumulative sum of each statistic. Hours up to
+    the last imported one are never imported twice, so closed hours can be
+    queued again after a restart to fill whatever was missed.
+
+    A daily reset that is not on the hour leaves the part of the running hour
+    before the reset as carry, which is added once the hour closes. The state
+    is persisted as a flat dict of floats: ``hour``, ``sum:<key>`` and
+    ``carry:<key>`` with ``carry:id``.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, stored: dict[str, float] | None
+    ) -> None:
+        """Initialize the writer, optionally from its persisted form."""
+        self._hass = hass
+        self._prefix = f"{DOMAIN}:{entry_id.lower()}_"
+        self.hour = 0
+        self.sums: dict[str, float] = {}
+        self.carry: dict[str, float] = {}
+        self.carry_hour: int | None = None
+        self._pending: dict[int, dict[str, float]] = {}
+        for name, value in (stored or {}).items():
+            bucket, _, key = name.partition(":")
+            if bucket == "hour":
+                self.hour = int(value)
+            elif bucket == "sum":
+                self.sums[key] = value
+            elif key == "id":
+                self.carry_hour = int(value)
+            else:
+                self.carry[key] = value
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the persisted form of the writer."""
+        data = {"hour": float(self.hour)}
+        data.update((f"sum:{key}", value) for key, value in self.sums.items())
+        if self.carry_hour is not None:
+            data["carry:id"] = float(self.carry_hour)
+            data.update((f"carry:{key}", value) for key, value in self.carry.items())
+        return data
+
+    def statistic_id(self, key: str) -> str:
+        """Return the statistic id of a key."""
+        return f"{self._prefix}{key}"
+
+    async def async_load_sums(self, keys: list[str]) -> None:
+        """Continue the sums of statistics imported before, e.g. a lost store."""
+        missing = [key for key in keys if key not in self.sums]
+        if not missing:
+            return
+        recorder = get_instance(self._hass)
+        for key in missing:
+            statistic_id = self.statistic_id(key)
+            last = await recorder.async_add_executor_job(
+                get_last_statistics,
+                self._hass,
+                1,
+                statistic_id,
+                False,  # noqa: FBT003
+                {"sum"},
+            )
+            rows = last.get(statistic_id)
+            if not rows:
+                continue
+            self.sums[key] = rows[0].get("sum") or 0.0
+            self.hour = max(self.hour, int(rows[0]["start"]) // 3600)
+
+    def queue(self, hours: dict[int, dict[str, float]], running: int | None) -> None:
+        """Queue the closed hours not imported yet."""
+        for hour_id, energies in hours.items():
+            if hour_id > self.hour and hour_id != running:
+                self._pending[hour_id] = energies
+
+    def add_carry(self, hour_id: int, energies: dict[str, float]) -> None:
+        """Keep the energies of a running hour interrupted by the daily reset."""
+        if hour_id != self.carry_hour:
+            self.carry = {}
+            self.carry_hour = hour_id
+        for key, value in energies.items():
+            self.carry[key] = self.carry.get(key, 0.0) + value
+
+    @callback
+    def async_emit(self) -> bool:
+        """Import the queued hours, return if anything was imported."""
+        if not self._pending:
+            return False
+        pending = dict(sorted(self._pending.items()))
+        self._pending = {}
+        if self.carry_hour is not None and self.carry_hour in pending:
+            hour = pending[self.carry_hour] = dict(pending[self.carry_hour])
+            for key, value in self.carry.items():
+                hour[key] = hour.get(key, 0.0) + value
+            self.carry = {}
+            self.carry_hour = None
+
+        keys = set(self.sums).union(*pending.values())
+        for key in sorted(keys):
+            total = self.sums.get(key, 0.0)
+            rows = []
+            for hour_id, energies in pending.items():
+                total += energies.get(key, 0.0)
+                rows.append(
+                    StatisticData(start=hour_start(hour_id), state=total, sum=total)
+                )
+            self.sums[key] = total
+            metadata = StatisticMetaData(
+                mean_type=StatisticMeanType.NONE,
+                has_sum=True,
+                name=statistic_name(key),
+                source=DOMAIN,
+                statistic_id=self.statistic_id(key),
+                unit_of_measurement=UnitOfEnergy.WATT_HOUR,
+            )
+            async_add_external_statistics(self._hass, metadata, rows)
+
+        self.hour = max(pending)
+        _LOGGER.debug(
+            "Imported %s hours of statistics for %s keys", len(pending), len(keys)
+        )
+        return True
@@ -0,0 +1,268 @@
+"""Persistence handling for Energy Stats integration."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.json import json_bytes
+from homeassistant.helpers.storage import Store
+
+from .journal import EnergyStatsJournal, journal_path, remove_journal
+from .metrics import EnergyStatsMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = "energy_stats_data"
+
+
+class SharedStore:
+    """
+    One Store file holding the data of all config entries.
+
+    Entries schedule their writes here. A single timer writes every entry with
+    pending changes once the earliest write is due, and the saves of one loop
+    iteration are coalesced into one file write, so the number of writes does
+    not grow with the number of entries. Data of the former per-entry files is
+    loaded once and the file removed after the data was written here.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the shared store."""
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data: dict[str, dict[str, Any]] | None = None
+        self._load_lock = asyncio.Lock()
+        self._legacy: dict[str, Store] = {}
+        self._write: asyncio.Task | None = None
+        self._scheduled: set[EnergyStatsStorage] = set()
+        self._write_due = 0.0
+        self._unsub_write: CALLBACK_TYPE | None = None
+
+    async def async_load(self, entry_id: str) -> dict[str, Any] | None:
+        """Return the stored data of an entry."""
+        async with self._load_lock:
+            if self._data is None:
+                self._data = await self._store.async_load() or {}
+        if entry_id in self._data:
+            return self._data[entry_id]
+        legacy = Store(self._hass, STORAGE_VERSION, f"{STORAGE_KEY}_{entry_id}")
+        stored = await legacy.async_load()
+        if stored:
+            self._legacy[entry_id] = legacy
+        return stored
+
+    async def async_save(self, entry_id: str, data: dict[str, Any]) -> None:
+        """Save the data of an entry together with the other pending saves."""
+        if self._data is None:
+            await self.async_load(entry_id)
+        self._data[entry_id] = data
+        if self._write is None:
+            self._write = self._hass.async_create_task(
+                self._async_write(), "energy_stats write"
+            )
+        await asyncio.shield(self._write)
+
+    async def async_remove(self, entry_id: str) -> None:
+        """Drop the data of a removed entry."""
+        await self.async_load(entry_id)
+        if self._data.pop(entry_id, None) is not None:
+            await self._store.async_save(self._data)
+
+    @callback
+    def async_schedule(self, storage: "EnergyStatsStorage", delay: float) -> None:
+        """Write an entry at the latest after the delay."""
+        self._scheduled.add(storage)
+        due = time.monotonic() + delay
+        if self._unsub_write is not None and self._write_due <= due:
+            return
+        if self._unsub_write is not None:
+            self._unsub_write()
+        self._write_due = due
+        self._unsub_write = async_call_later(
+            self._hass, delay, self._async_scheduled_write
+        )
+
+    @callback
+    def async_unschedule(self, storage: "EnergyStatsStorage") -> None:
+        """Drop the scheduled write of an entry."""
+        self._scheduled.discard(storage)
+        if not self._scheduled and self._unsub_write is not None:
+            self._unsub_write()
+            self._unsub_write = None
+
+    def is_scheduled(self, storage: "EnergyStatsStorage") -> bool:
+        """Return if a write of the entry is scheduled."""
+        return storage in self._scheduled
+
+    async def _async_scheduled_write(self, _now: datetime) -> None:
+        self._unsub_write = None
+        await asyncio.gather(*(storage.async_flush() for storage in self._scheduled))
+
+    async def _async_write(self) -> None:
+        # Let the saves of the same loop iteration join this write
+        await asyncio.sleep(0)
+        self._write = None
+        await self._store.async_save(self._data)
+        for entry_id in [
+            entry_id for entry_id in self._legacy if entry_id in self._data
+        ]:
+            await self._legacy.pop(entry_id).async_remove()
+
+
+class EnergyStatsStorage:
+    """
+    Store wrapper that coalesces writes of changed buckets.
+
+    Buckets are marked dirty as they change. The first change after a write
+    schedules the next write ``flush_interval`` seconds later, so at most that
+    much accumulation is lost on a crash. Pending changes are also written on
+    Home Assistant's final write and when the storage is closed. All entries
+    are written through one SharedStore.
+
+    With the journal enabled, the changes of every update are appended to the
+    journal instead. The snapshot is only written once the journal grew large,
+    which compacts it, and on shutdown. Every bucket is read through its own
+    getter, so an update builds only the buckets it changed.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        flush_interval: float,
+        buckets: dict[str, Callable[[], Any]],
+        *,
+        store: SharedStore,
+        journal: bool = False,
+        metrics: EnergyStatsMetrics | None = None,
+    ) -> None:
+        """Initialize storage for the provided config entry."""
+        self._hass = hass
+        self._entry_id = entry_id
+        self._store = store
+        self.flush_interval = flush_interval
+        self._buckets = buckets
+        self._metrics = metrics
+        self._dirty: set[str] = set()
+        self._journal = EnergyStatsJournal(hass, entry_id) if journal else None
+        self._journal_dirty: set[str] = set()
+        self._unsub_final_write: CALLBACK_TYPE | None = None
+
+    @property
+    def dirty(self) -> frozenset[str]:
+        """Return the buckets changed since the last write."""
+        return frozenset(self._dirty)
+
+    @property
+    def write_pending(self) -> bool:
+        """Return if a write is scheduled."""
+        return self._store.is_scheduled(self)
+
+    async def async_load(self) -> dict[str, Any] | None:
+        """Load the stored buckets, including journaled changes."""
+        self._unsub_final_write = self._hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_FINAL_WRITE, self._async_final_write
+        )
+        stored = await self._store.async_load(self._entry_id)
+        if self._journal is None:
+            # Stale lines would be replayed if the journal is enabled again
+            await self._hass.async_add_executor_job(
+                remove_journal, journal_path(self._hass, self._entry_id)
+            )
+            return stored
+        return await self._journal.async_replay(stored or {}) or None
+
+    @callback
+    def async_mark_dirty(self, *buckets: str) -> None:
+        """Mark buckets as changed and schedule a write if none is pending."""
+        self._dirty.update(buckets)
+        if self._journal is not None:
+            # Written by async_commit once the journal grew large
+            self._journal_dirty.update(buckets)
+        elif not self.write_pending:
+            # Rescheduling would postpone the pending write indefinitely
+            self._store.async_schedule(self, self.flush_interval)
+
+    @callback
+    def async_commit(self) -> None:
+        """
+        Append the changes of the current update to the journal.
+
+        Schedules the snapshot write once the journal grew large.
+        """
+        if self._journal is None or not self._journal_dirty:
+            return
+        self._journal.async_append(
+            {
+                bucket: self._buckets[bucket]()
+                for bucket in self._journal_dirty
+                if bucket in self._buckets
+            }
+        )
+        self._journal_dirty.clear()
+        if self._journal.compaction_due and not self.write_pending:
+            self._store.async_schedule(self, 0)
+
+    @callback
+    def async_flush_soon(self) -> None:
+        """Write pending changes on the next loop iteration."""
+        if self._dirty:
+            self._hass.async_create_task(self.async_flush(), "energy_stats write")
+
+    async def async_flush(self) -> None:
+        """
+        Write pending changes immediately.
+
+        With the journal enabled, it continues in a new file before the
+        snapshot is written, and the former file is deleted once it is saved.
+        """
+        if not self._dirty:
+            return
+        if self._journal is None:
+            await self._async_save()
+            return
+        self.async_commit()
+        await self._journal.async_rotate()
+        if await self._async_save():
+            await self._journal.async_drop_rotated()
+
+    async def async_close(self) -> None:
+        """Write pending changes and stop writing."""
+        if self._unsub_final_write is not None:
+            self._unsub_final_write()
+            self._unsub_final_write = None
+        await self.async_flush()
+
+    async def _async_final_write(self, _event: Event) -> None:
+        self._unsub_final_write = None
+        await self.async_flush()
+
+    async def _async_save(self) -> bool:
+        data = self._collect()
+        started = time.perf_counter()
+        try:
+            await self._store.async_save(self._entry_id, data)
+        except Exception:
+            _LOGGER.exception("Error while saving stats")
+            return False
+        if self._metrics is not None:
+            self._metrics.observe_save(
+                time.perf_counter() - started, len(json_bytes(data))
+            )
+        return True
+
+    def _collect(self) -> dict[str, Any]:
+        _LOGGER.debug("Writing changed buckets: %s", self._dirty)
+        self._dirty.clear()
+        self._store.async_unschedule(self)
+        data = {bucket: getter() for bucket, getter in self._buckets.items()}
+        if self._journal is not None:
+            data["journal_seq"] = self._journal.seq
+        return data
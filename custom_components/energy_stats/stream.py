@@ -0,0 +1,99 @@
+"""Server-sent event streaming of Energy Stats snapshots."""
+
+import asyncio
+import logging
+
+from homeassistant.core import callback
+from homeassistant.helpers.json import json_bytes
+
+from .snapshot import EnergyStatsSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+# Pending events per subscriber before it is resynchronized with a snapshot
+STREAM_QUEUE_SIZE = 16
+
+
+def snapshot_event(snapshot: EnergyStatsSnapshot) -> bytes:
+    """Return the event carrying all values of a snapshot."""
+    return b'id: %d\nevent: snapshot\ndata: {"version":"%b","data":%b}\n\n' % (
+        snapshot.version,
+        snapshot.token.encode(),
+        snapshot.body,
+    )
+
+
+class StreamSubscriber:
+    """Bounded event queue of one streaming client."""
+
+    __slots__ = ("_queue", "_resync", "closed")
+
+    def __init__(self) -> None:
+        """Initialize an empty queue."""
+        self._queue: asyncio.Queue[bytes | None] = asyncio.Queue(STREAM_QUEUE_SIZE)
+        self._resync = False
+        self.closed = False
+
+    @callback
+    def offer(self, event: bytes | None) -> None:
+        """
+        Queue an event without ever waiting for the client.
+
+        A client that falls behind has its queue dropped and gets a full
+        snapshot instead once it reads again.
+        """
+        if self._resync:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._resync = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    async def get(self) -> bytes | None:
+        """Return the next event, or None if a snapshot has to be sent."""
+        event = await self._queue.get()
+        if event is None:
+            self._resync = False
+        return event
+
+
+class SnapshotStream:
+    """Fan-out of snapshot deltas, encoded once for all subscribers."""
+
+    def __init__(self) -> None:
+        """Initialize the stream without subscribers."""
+        self._subscribers: set[StreamSubscriber] = set()
+
+    @callback
+    def subscribe(self) -> StreamSubscriber:
+        """Add a new subscriber."""
+        subscriber = StreamSubscriber()
+        self._subscribers.add(subscriber)
+        _LOGGER.debug("Stream subscribers: %d", len(self._subscribers))
+        return subscriber
+
+    @callback
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        """Remove a subscriber."""
+        self._subscribers.discard(subscriber)
+
+    @callback
+    def publish(self, old: EnergyStatsSnapshot, new: EnergyStatsSnapshot) -> None:
+        """Send the changes between two snapshots to all subscribers."""
+        if not self._subscribers or new is old:
+            return
+        payload = json_bytes(new.changes_since(old.version))
+        event = b"id: %d\nevent: delta\ndata: %b\n\n" % (new.version, payload)
+        for subscriber in self._subscribers:
+            subscriber.offer(event)
+
+    @callback
+    def close(self) -> None:
+        """End all subscriptions."""
+        for subscriber in self._subscribers:
+            subscriber.closed = True
+            subscriber.offer(None)
+        self._subscribers.clear()
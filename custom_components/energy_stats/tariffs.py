@@ -0,0 +1,195 @@
+"""Energy costs and feed-in revenue for Energy Stats integration."""
+
+import bisect
+import math
+from array import array
+from collections.abc import Iterable
+from typing import Any
+
+from .calculations import trapezoid
+
+# Daily cost bucket -> tariff and the flow cells it prices
+COST_BUCKETS = {
+    "grid_in_cost": ("import", ("grid_home", "grid_car", "grid_battery")),
+    "home_cost": ("import", ("grid_home",)),
+    "car_cost": ("import", ("grid_car",)),
+    "grid_out_revenue": ("export", ("pv_grid", "battery_grid")),
+}
+# Tariff -> role of its price entity, see SENSOR_KEYS
+TARIFF_ROLES = {"import": "import_price", "export": "export_price"}
+
+
+class PriceCurve:
+    """
+    Prices of one tariff as a step function of time.
+
+    The start timestamps and prices are kept sorted in two parallel arrays, so
+    the price at a time is found by bisection. Each price applies from its
+    start until the next one, times before the first start have no price.
+    """
+
+    def __init__(self, points: Iterable[tuple[float, float]] = ()) -> None:
+        """Initialize the curve, optionally with (start, price) points."""
+        self._starts = array("d")
+        self._prices = array("d")
+        self.update(points)
+
+    def points(self) -> list[tuple[float, float]]:
+        """Return the (start, price) points in order."""
+        return list(zip(self._starts, self._prices, strict=True))
+
+    def price_at(self, timestamp: float) -> float | None:
+        """Return the price in effect at a time, None before the first one."""
+        pos = bisect.bisect_right(self._starts, timestamp) - 1
+        return self._prices[pos] if pos >= 0 else None
+
+    def update(self, points: Iterable[tuple[float, float]]) -> None:
+        """Replace the points within the range of a schedule by its points."""
+        points = sorted(points)
+        if not points:
+            return
+        first = bisect.bisect_left(self._starts, points[0][0])
+        last = bisect.bisect_right(self._starts, points[-1][0])
+        self._starts[first:last] = array("d", (start for start, _ in points))
+        self._prices[first:last] = array("d", (price for _, price in points))
+
+    def observe(self, timestamp: float, price: float | None) -> bool:
+        """Add the price read at a time if it differs, return if it did."""
+        if price is None or self.price_at(timestamp) == price:
+            return False
+        self.update([(timestamp, price)])
+        return True
+
+    def mean_price(self, start: float, end: float) -> float:
+        """Return the time-weighted mean price of an interval, 0 if unpriced."""
+        if end <= start:
+            return self.price_at(end) or 0.0
+        starts = self._starts
+        prices = self._prices
+        pos = bisect.bisect_right(starts, start) - 1
+        total = 0.0
+        since = start
+        while since < end:
+            until = min(end, starts[pos + 1] if pos + 1 < len(starts) else math.inf)
+            if pos >= 0:
+                total += prices[pos] * (until - since)
+            since = until
+            pos += 1
+        return total / (end - start)
+
+    def trim(self, before: float) -> None:
+        """Drop the points before a time, keeping the price in effect then."""
+        pos = bisect.bisect_right(self._starts, before) - 1
+        if pos > 0:
+            del self._starts[:pos]
+            del self._prices[:pos]
+
+
+class TariffCosts:
+    """
+    Daily costs and revenue of the energy flows, priced by the tariffs.
+
+    Every update prices the flow energies of the interval since the previous
+    one with the mean price of their tariff over that interval, so price
+    changes within an interval are weighted exactly. Correcting a tariff
+    prices the hours of the day again from their rolled up flow energies.
+
+    Costs are in the currency of the prices, which are per kWh. The state is
+    persisted as a flat dict: ``cost:<bucket>`` with the cost and ``<tariff>``
+    with the list of [start, price] points of the curve.
+    """
+
+    def __init__(self, stored: dict[str, Any] | None = None) -> None:
+        """Initialize the costs, optionally from their persisted form."""
+        self.costs: dict[str, float] = {}
+        points: dict[str, list[tuple[float, float]]] = {}
+        for name, value in (stored or {}).items():
+            bucket, _, key = name.partition(":")
+            if bucket == "cost":
+                self.costs[key] = value
+            elif not key:
+                points.setdefault(bucket, []).extend(
+                    (float(start), float(price)) for start, price in value
+                )
+            else:
+                # Points stored as <tariff>:<start> before
+                points.setdefault(bucket, []).append((float(key), value))
+        self.curves = {
+            tariff: PriceCurve(points.get(tariff, ())) for tariff in TARIFF_ROLES
+        }
+        self._last_flows: dict[str, float] | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the persisted form of the costs and curves."""
+        data: dict[str, Any] = {
+            f"cost:{key}": value for key, value in self.costs.items()
+        }
+        for tariff, curve in self.curves.items():
+            points = curve.points()
+            if points:
+                data[tariff] = [[start, price] for start, price in points]
+        return data
+
+    def observe(self, prices: dict[str, float | None], timestamp: float) -> bool:
+        """Add the prices read from the price entities, return if any changed."""
+        changed = False
+        for tariff, role in TARIFF_ROLES.items():
+            if self.curves[tariff].observe(timestamp, prices.get(role)):
+                changed = True
+        return changed
+
+    def integrate(
+        self, flows: dict[str, float], start: float, end: float, *, step: bool = False
+    ) -> dict[str, float]:
+        """Add the costs of the interval since the previous update, return them."""
+        last_flows = self._last_flows or flows
+        self._last_flows = flows
+        if end <= start:
+            return {}
+
+        elapsed_h = (end - start) / 3600
+        mean_prices = {
+            tariff: curve.mean_price(start, end)
+            for tariff, curve in self.curves.items()
+        }
+        added = {}
+        for bucket, (tariff, cells) in COST_BUCKETS.items():
+            energy = sum(
+                trapezoid(last_flows[cell], flows[cell], elapsed_h, step=step)
+                for cell in cells
+            )
+            cost = energy / 1000 * mean_prices[tariff]
+            if cost:
+                self.costs[bucket] = self.costs.get(bucket, 0.0) + cost
+                added[bucket] = cost
+        return added
+
+    def reprice(
+        self, hours: dict[int, dict[str, float]], start: float, end: float
+    ) -> None:
+        """
+        Price the flow energies of the hours of a day again.
+
+        Only the energies per hour are kept, so each hour is priced with the
+        time-weighted mean price of the hour. That assumes the energy flowed
+        evenly within the hour, so prices changing within an hour are only
+        exact for constant flows, unlike the pricing of every update.
+        """
+        costs = dict.fromkeys(COST_BUCKETS, 0.0)
+        for hour_id, energies in hours.items():
+            since = max(start, hour_id * 3600.0)
+            until = min(end, (hour_id + 1) * 3600.0)
+            mean_prices = {
+                tariff: curve.mean_price(since, until)
+                for tariff, curve in self.curves.items()
+            }
+            for bucket, (tariff, cells) in COST_BUCKETS.items():
+                energy = sum(energies.get(cell, 0.0) for cell in cells)
+                costs[bucket] += energy / 1000 * mean_prices[tariff]
+        self.costs = costs
+
+    def reset(self, start: float) -> None:
+        """Start a new day, keeping the prices in effect from its start."""
+        self.costs = {}
+        for curve in self.curves.values():
+            curve.trim(start)
@@ -0,0 +1,632 @@
+"""
+Benchmark and replay harness for the Energy Stats update path.
+
+Drives EnergyStatsCoordinator with synthetic or recorded input streams on a
+simulated clock, inside a local Home Assistant instance without network or
+recorder. For every combination of tick rate and number of config entries it
+reports the update latency, the memory retained per update, the Store and
+journal write volume, and the deviation of the integrated daily energies and
+flows and mix ratios from a reference integration at 1 s resolution.
+
+Run it through scripts/benchmark, see --help for the options. A recorded
+stream is a CSV file with the columns time (seconds from the start), role
+(a key of SENSOR_KEYS), value and unit; values are held until the next row
+of the same role.
+"""
+
+# ruff: noqa: INP001, PLR2004, T201
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import math
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from energy_stats.const import (
+    CONF_DAILY_RESET,
+    CONF_FLUSH_INTERVAL,
+    CONF_JOURNAL,
+    CONF_UPDATE_MODE,
+    DOMAIN,
+    SENSOR_KEYS,
+    UPDATE_MODE_ADAPTIVE,
+    UPDATE_MODE_EVENT,
+    UPDATE_MODE_POLLING,
+)
+from energy_stats.coordinator import EnergyStatsCoordinator
+from energy_stats.engine import async_get_engine
+from energy_stats.journal import journal_path
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.json import json_bytes
+from homeassistant.util import dt as dt_util
+
+# Updates with allocation tracing, after the timed updates
+ALLOCATION_UPDATES = 500
+
+# Daily key -> (power role, sign) of the energies integrated from power
+POWER_ENERGY_KEYS = {
+    "grid_in_energy_daily": ("grid_power", 1),
+    "grid_out_energy_daily": ("grid_power", -1),
+    "pv_energy_daily": ("pv_power", 1),
+    "car_charging_energy": ("car_charging_power", 1),
+}
+
+# Power roles sampled for the reference integration
+REFERENCE_ROLES = ("grid_power", "pv_power", "battery_power", "car_charging_power")
+
+Values = dict[str, tuple[float | str, str | None]]
+
+
+class SyntheticSite:
+    """
+    Synthetic site of one config entry.
+
+    Clear-sky PV with passing clouds, a base load, an evening car charge and
+    optionally a battery that stores the PV surplus.
+    """
+
+    def __init__(self, index: int, *, battery: bool) -> None:
+        """Initialize the site, offset by its index so sites differ."""
+        self.roles = [
+            "grid_power",
+            "grid_in_energy",
+            "pv_power",
+            "car_charging_power",
+            "car_connected",
+        ]
+        if battery:
+            self.roles.append("battery_power")
+        self._battery = battery
+        self._phase = index * 0.37
+        self._imported_wh = 0.0
+        self._last_t = 0.0
+
+    def powers(self, t: float) -> dict[str, float]:
+        """Return the powers in W at t seconds after the start of the day."""
+        hour = t / 3600.0
+        pv = 0.0
+        if 6.0 < hour < 20.0:
+            pv = 6000.0 * math.sin(math.pi * (hour - 6.0) / 14.0)
+            # Passing clouds
+            pv *= 0.65 + 0.35 * math.cos(t / 420.0 + self._phase) ** 2
+        home = 350.0 + 250.0 * math.sin(t / 900.0 + self._phase) ** 2
+        if 11.5 < hour < 12.5 or 18.0 < hour < 19.0:
+            # Cooking
+            home += 2000.0
+        car = 11000.0 if 19.0 < hour < 21.5 else 0.0
+        battery = 0.0
+        if self._battery:
+            surplus = pv - home - car
+            # Positive while discharging
+            battery = -min(3000.0, surplus) if surplus > 0 else min(2500.0, -surplus)
+            if 16.0 < hour < 24.0 and battery > 0:
+                battery = min(battery, 1500.0)
+            elif battery > 0:
+                battery = 0.0
+        grid = home + car - pv - battery
+        return {"grid_power": grid, "pv_power": pv, "car_charging_power": car} | (
+            {"battery_power": battery} if self._battery else {}
+        )
+
+    def values(self, t: float) -> Values:
+        """Return the state of every role, advancing the import meter to t."""
+        powers = self.powers(t)
+        self._imported_wh += max(0.0, powers["grid_power"]) * (t - self._last_t) / 3600
+        self._last_t = t
+        values: Values = {key: (round(value, 1), "W") for key, value in powers.items()}
+        # Meters report whole Wh in kWh
+        values["grid_in_energy"] = (round(self._imported_wh / 1000.0, 3), "kWh")
+        values["car_connected"] = ("on" if 18.5 < t / 3600.0 < 22.0 else "off", None)
+        return values
+
+
+class ReplaySite:
+    """Recorded input stream, sampled and held."""
+
+    def __init__(self, path: Path) -> None:
+        """Load the rows of a recorded stream."""
+        with path.open(newline="", encoding="utf-8") as file:
+            self._rows = sorted(
+                (
+                    (float(row["time"]), row["role"], row["value"], row["unit"] or None)
+                    for row in csv.DictReader(file)
+                ),
+                key=lambda row: row[0],
+            )
+        unknown = {row[1] for row in self._rows} - SENSOR_KEYS.keys()
+        if unknown:
+            msg = f"Unknown roles in {path}: {', '.join(sorted(unknown))}"
+            raise ValueError(msg)
+        self.roles = sorted({row[1] for row in self._rows})
+        self._pos = 0
+        self._held: Values = {}
+
+    def powers(self, t: float) -> dict[str, float]:
+        """Return the held powers in W at t."""
+        self._advance(t)
+        powers = {}
+        for role, (value, unit) in self._held.items():
+            if SENSOR_KEYS[role][0] == "power":
+                factor = 1000.0 if unit and unit.lower() == "kw" else 1.0
+                powers[role] = float(value) * factor
+        return powers
+
+    def values(self, t: float) -> Values:
+        """Return the held state of every role at t."""
+        self._advance(t)
+        return dict(self._held)
+
+    def _advance(self, t: float) -> None:
+        rows = self._rows
+        while self._pos < len(rows) and rows[self._pos][0] <= t:
+            _, role, value, unit = rows[self._pos]
+            self._held[role] = (value, unit)
+            self._pos += 1
+
+
+def reference_totals(site: SyntheticSite | ReplaySite, seconds: int) -> dict:
+    """
+    Integrate the site at 1 s resolution with the trapezoidal rule.
+
+    Nothing of the integration is used, so an error in its allocation, flow
+    cells or ratios shows up as a deviation. The powers are sampled into
+    arrays first, then the energies, the flows and the ratios are derived
+    from them directly.
+    """
+    samples = {role: array("d") for role in REFERENCE_ROLES}
+    for t in range(seconds + 1):
+        powers = site.powers(float(t))
+        for role, column in samples.items():
+            column.append(powers.get(role, math.nan))
+
+    totals = dict.fromkeys(POWER_ENERGY_KEYS, 0.0)
+    for key, (role, sign) in POWER_ENERGY_KEYS.items():
+        column = samples[role]
+        for pos in range(1, len(column)):
+            if not math.isnan(column[pos - 1]) and not math.isnan(column[pos]):
+                totals[key] += (
+                    max(0.0, sign * column[pos - 1]) + max(0.0, sign * column[pos])
+                ) / 7200.0
+    totals = {key: value for key, value in totals.items() if value > 0}
+
+    flows: dict[str, float] = {}
+    last = None
+    for pos in range(seconds + 1):
+        sample = {role: column[pos] for role, column in samples.items()}
+        current = None
+        if not math.isnan(sample["grid_power"]):
+            current = reference_flows(sample)
+        if last is not None and current is not None:
+            for cell in current.keys() | last.keys():
+                flows[cell] = (
+                    flows.get(cell, 0.0)
+                    + (last.get(cell, 0.0) + current.get(cell, 0.0)) / 7200.0
+                )
+        last = current or last
+
+    totals.update((f"flow_{cell}", value) for cell, value in flows.items())
+    totals.update(reference_ratios(flows))
+    return totals
+
+
+def reference_flows(sample: dict[str, float]) -> dict[str, float]:
+    """
+    Split the momentary supply of the sources among the sinks.
+
+    Export takes PV before battery, charging takes PV before grid, and home
+    and car share what is left of every source in proportion to their demand.
+    """
+
+    def power(role: str, sign: int) -> float:
+        value = sample[role]
+        return 0.0 if math.isnan(value) else max(0.0, sign * value)
+
+    supply = {
+        "pv": power("pv_power", 1),
+        "grid": power("grid_power", 1),
+        "battery": power("battery_power", 1),
+    }
+    demand = {"grid": power("grid_power", -1), "battery": power("battery_power", -1)}
+    flows = {}
+    for sink, sources in (("grid", ("pv", "battery")), ("battery", ("pv", "grid"))):
+        for source in sources:
+            flow = min(supply[source], demand[sink])
+            flows[f"{source}_{sink}"] = flow
+            supply[source] -= flow
+            demand[sink] -= flow
+
+    rest = sum(supply.values())
+    if rest > 0:
+        car = min(power("car_charging_power", 1), rest)
+        for source, left in supply.items():
+            flows[f"{source}_car"] = car * left / rest
+            flows[f"{source}_home"] = (rest - car) * left / rest
+    return flows
+
+
+def reference_ratios(flows: dict[str, float]) -> dict[str, float]:
+    """Return the daily mix ratios of the flow energies."""
+
+    def ratio(part: float, total: float) -> float:
+        return part / total if total > 0 else 0.0
+
+    def cell(name: str) -> float:
+        return flows.get(name, 0.0)
+
+    charged_pv = ratio(cell("pv_battery"), cell("pv_battery") + cell("grid_battery"))
+
+    def pv_mix(sink: str) -> float:
+        received = cell(f"pv_{sink}") + cell(f"grid_{sink}") + cell(f"battery_{sink}")
+        return ratio(
+            cell(f"pv_{sink}") + cell(f"battery_{sink}") * charged_pv, received
+        )
+
+    generated = sum(cell(f"pv_{sink}") for sink in ("home", "car", "battery", "grid"))
+    consumed = sum(
+        cell(f"{source}_{sink}")
+        for source in ("pv", "grid", "battery")
+        for sink in ("home", "car")
+    )
+    return {
+        "home_energy_mix_daily": pv_mix("home"),
+        "battery_energy_mix_daily": charged_pv,
+        "car_charging_energy_mix": pv_mix("car"),
+        "self_consumption_daily": ratio(generated - cell("pv_grid"), generated),
+        "self_sufficiency_daily": ratio(
+            consumed - cell("grid_home") - cell("grid_car"), consumed
+        ),
+    }
+
+
+@dataclass
+class Scenario:
+    """One combination of the benchmark parameters."""
+
+    mode: str
+    rate: float
+    entries: int
+    hours: float
+    flush_interval: float
+    journal: bool
+    battery: bool
+    replay: Path | None
+
+
+@dataclass
+class Result:
+    """Measurements of one scenario."""
+
+    scenario: Scenario
+    latencies_ns: list[int] = field(default_factory=list)
+    degraded_updates: int = 0
+    retained_bytes_per_update: float = 0.0
+    peak_bytes: int = 0
+    store_writes: int = 0
+    store_bytes: int = 0
+    journal_bytes: int = 0
+    errors: dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> dict[str, Any]:
+        """Return the measurements as a flat dict."""
+        latencies = sorted(self.latencies_ns) or [0]
+
+        def percentile(fraction: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+        return {
+            "mode": self.scenario.mode,
+            "rate_s": self.scenario.rate,
+            "entries": self.scenario.entries,
+            "updates": len(self.latencies_ns),
+            "degraded": self.degraded_updates,
+            "mean_us": statistics.fmean(latencies) / 1000,
+            "p50_us": percentile(0.50) / 1000,
+            "p99_us": percentile(0.99) / 1000,
+            "max_us": latencies[-1] / 1000,
+            "retained_b_per_update": self.retained_bytes_per_update,
+            "peak_kib": self.peak_bytes / 1024,
+            "store_writes": self.store_writes,
+            "store_kib": self.store_bytes / 1024,
+            "journal_kib": self.journal_bytes / 1024,
+            "max_error": max(self.errors.values(), default=0.0),
+        }
+
+
+def make_site(index: int, scenario: Scenario) -> SyntheticSite | ReplaySite:
+    """Return the input stream of one config entry."""
+    if scenario.replay:
+        return ReplaySite(scenario.replay)
+    return SyntheticSite(index, battery=scenario.battery)
+
+
+def make_entry(index: int, scenario: Scenario, roles: list[str]) -> ConfigEntry:
+    """Return a config entry reading the inputs of one site."""
+    data: dict[str, Any] = {
+        role: f"sensor.site{index}_{role}" for role in roles if role in SENSOR_KEYS
+    }
+    data[CONF_DAILY_RESET] = "00:00"
+    data[CONF_UPDATE_MODE] = scenario.mode
+    data[CONF_FLUSH_INTERVAL] = scenario.flush_interval
+    data[CONF_JOURNAL] = scenario.journal
+    now = dt_util.utcnow()
+    return ConfigEntry(
+        created_at=now,
+        data=data,
+        disabled_by=None,
+        discovery_keys={},
+        domain=DOMAIN,
+        entry_id=f"benchmark{index}",
+        minor_version=1,
+        modified_at=now,
+        options={},
+        pref_disable_new_entities=None,
+        pref_disable_polling=None,
+        source="user",
+        state=None,
+        subentries_data=None,
+        title=f"Benchmark {index}",
+        unique_id=None,
+        version=1,
+    )
+
+
+class WriteCounter:
+    """Counts the writes of the shared store and the size of the written data."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinators: list[EnergyStatsCoordinator],
+        result: Result,
+    ) -> None:
+        """Wrap the save function of the shared store."""
+        store = async_get_engine(hass).store._store  # noqa: SLF001
+        save = store.async_save
+
+        async def counting_save(data: dict[str, Any]) -> None:
+            result.store_writes += 1
+            result.store_bytes += len(json_bytes(data))
+            await save(data)
+
+        store.async_save = counting_save
+        self.storages = [coordinator._storage for coordinator in coordinators]  # noqa: SLF001
+        # Simulated time at which the pending writes are due
+        self.due: float | None = None
+
+    async def async_tick(self, t: float) -> None:
+        """Write on the simulated clock what the shared timer would write."""
+        pending = [storage for storage in self.storages if storage.write_pending]
+        if not pending:
+            self.due = None
+        elif self.due is None:
+            self.due = t + min(storage.flush_interval for storage in pending)
+        elif t >= self.due:
+            self.due = None
+            await asyncio.gather(*(storage.async_flush() for storage in pending))
+
+
+def set_states(
+    hass: HomeAssistant, index: int, values: Values, timestamp: float
+) -> None:
+    """Set the input entities of one site."""
+    for role, (value, unit) in values.items():
+        hass.states.async_set(
+            f"sensor.site{index}_{role}",
+            str(value),
+            {ATTR_UNIT_OF_MEASUREMENT: unit} if unit else None,
+            timestamp=timestamp,
+        )
+
+
+async def run_scenario(scenario: Scenario) -> Result:  # noqa: PLR0915
+    """Run one scenario in a fresh Home Assistant instance."""
+    result = Result(scenario)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        sites = [make_site(index, scenario) for index in range(scenario.entries)]
+        coordinators = []
+        for index, site in enumerate(sites):
+            coordinator = EnergyStatsCoordinator(
+                hass, make_entry(index, scenario, site.roles)
+            )
+            await coordinator.async_load_stored()
+            await coordinator._async_load_data()  # noqa: SLF001
+            if coordinator._unsub_hour is not None:  # noqa: SLF001
+                # The hour timer runs on the real clock, the events close hours
+                coordinator._unsub_hour()  # noqa: SLF001
+                coordinator._unsub_hour = None  # noqa: SLF001
+            coordinators.append(coordinator)
+        counter = WriteCounter(hass, coordinators, result)
+
+        # Simulate the current daily period, so the reset check sees no reset
+        start = coordinators[0]._period_start(datetime.now(UTC))  # noqa: SLF001
+        seconds = int(scenario.hours * 3600)
+        ticks = int(seconds / scenario.rate)
+        unsubs = []
+        for coordinator in coordinators:
+            coordinator._last_update = start  # noqa: SLF001
+            if scenario.mode == UPDATE_MODE_EVENT:
+                unsubs.append(coordinator.async_track_inputs())
+
+        # Simulated time of the next update of each entry
+        due = [0.0] * len(coordinators)
+
+        async def tick(t: float, latencies: list[int] | None) -> None:
+            now = start + timedelta(seconds=t)
+            timestamp = now.timestamp()
+            for index, (site, coordinator) in enumerate(
+                zip(sites, coordinators, strict=True)
+            ):
+                values = site.values(t)
+                if scenario.mode == UPDATE_MODE_EVENT:
+                    began = time.perf_counter_ns()
+                    set_states(hass, index, values, timestamp)
+                    await hass.async_block_till_done()
+                else:
+                    set_states(hass, index, values, timestamp)
+                    if t < due[index]:
+                        # Adaptive polling did not schedule this tick
+                        continue
+                    elapsed = (now - coordinator._last_update).total_seconds()  # noqa: SLF001
+                    began = time.perf_counter_ns()
+                    data = coordinator._process_update(now)  # noqa: SLF001
+                    coordinator._adapt_interval(data, elapsed)  # noqa: SLF001
+                    if scenario.mode == UPDATE_MODE_ADAPTIVE:
+                        due[index] = t + coordinator.tick_interval.total_seconds()
+                if latencies is not None:
+                    latencies.append(time.perf_counter_ns() - began)
+                if coordinator.missing_inputs:
+                    result.degraded_updates += 1
+            await counter.async_tick(t)
+
+        for step in range(ticks + 1):
+            await tick(step * scenario.rate, result.latencies_ns)
+
+        # Compare before the allocation updates run past the simulated span
+        for index, coordinator in enumerate(coordinators):
+            totals = reference_totals(make_site(index, scenario), seconds)
+            result.errors.update(compare(coordinator, totals))
+
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for step in range(ticks + 1, ticks + 1 + ALLOCATION_UPDATES):
+                await tick(step * scenario.rate, None)
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        updates = ALLOCATION_UPDATES * len(coordinators)
+        result.retained_bytes_per_update = (after - before) / updates
+        result.peak_bytes = peak - before
+
+        for unsub in unsubs:
+            unsub()
+        for coordinator in coordinators:
+            journal = journal_path(hass, coordinator.entry_id)
+            if journal.exists():
+                result.journal_bytes += journal.stat().st_size
+            await coordinator.async_shutdown()
+        await hass.async_stop(force=True)
+    return result
+
+
+def compare(
+    coordinator: EnergyStatsCoordinator, totals: dict[str, float]
+) -> dict[str, float]:
+    """Return the relative error of each value checked against the reference."""
+    data = coordinator.snapshot.data
+    sensors = coordinator.sensors
+    errors = {}
+    for key, expected in totals.items():
+        if key in POWER_ENERGY_KEYS:
+            energy_role = key.removesuffix("_daily")
+            if sensors.get(energy_role):
+                # Read from a meter, nothing is integrated
+                continue
+            actual = data.get(key, 0.0)
+            # Absolute tolerance of 1 Wh for small totals
+            errors[key] = abs(actual - expected) / max(expected, 1.0)
+        elif key in data:
+            actual = data[key]
+            if key.startswith("flow_"):
+                errors[key] = abs(actual - expected) / max(expected, 1.0)
+            else:
+                # Ratios are compared absolutely
+                errors[key] = abs(actual - expected)
+    return errors
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--mode",
+        choices=[UPDATE_MODE_POLLING, UPDATE_MODE_ADAPTIVE, UPDATE_MODE_EVENT],
+        default=UPDATE_MODE_POLLING,
+    )
+    parser.add_argument(
+        "--rates",
+        default="1,5,30",
+        help="tick intervals in seconds, comma separated; the resolution of the "
+        "simulated clock in adaptive mode",
+    )
+    parser.add_argument(
+        "--entries", default="1,8", help="numbers of config entries, comma separated"
+    )
+    parser.add_argument(
+        "--hours", type=float, default=24.0, help="simulated hours, at most 24"
+    )
+    parser.add_argument("--flush-interval", type=float, default=60.0)
+    parser.add_argument("--journal", action="store_true")
+    parser.add_argument("--battery", action="store_true", help="add a battery")
+    parser.add_argument("--replay", type=Path, help="recorded stream, see above")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.01,
+        help="maximum relative error of energies and absolute error of ratios",
+    )
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args()
+    if not 0 < args.hours <= 24:
+        parser.error("--hours has to be within one daily period")
+    return args
+
+
+async def main() -> int:
+    """Run all scenarios and report them."""
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    scenarios = [
+        Scenario(
+            args.mode,
+            float(rate),
+            int(entries),
+            args.hours,
+            args.flush_interval,
+            args.journal,
+            args.battery,
+            args.replay,
+        )
+        for rate in args.rates.split(",")
+        for entries in args.entries.split(",")
+    ]
+
+    summaries = []
+    failed = False
+    for scenario in scenarios:
+        result = await run_scenario(scenario)
+        summary = result.summary()
+        summaries.append(summary | {"errors": result.errors})
+        failed |= summary["max_error"] > args.tolerance
+        print(
+            " ".join(
+                f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in summary.items()
+            )
+        )
+        for key, error in sorted(result.errors.items()):
+            if error > args.tolerance:
+                print(f"  {key} deviates by {error:.4f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(summaries, indent=2), encoding="utf-8")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1 @@
+"""Tests of Energy Stats integration."""
@@ -0,0 +1,167 @@
+"""Tests of the flow allocation and the flow matrix."""
+
+import math
+
+import pytest
+
+from custom_components.energy_stats.calculations import (
+    FLOW_CELLS,
+    allocate_flows,
+    hourly_energies,
+    trapezoid,
+)
+from custom_components.energy_stats.flows import FLOW_RATIOS, FlowMatrix
+
+
+def _source(flows: dict[str, float], source: str) -> float:
+    return sum(value for cell, value in flows.items() if cell.startswith(f"{source}_"))
+
+
+def _sink(flows: dict[str, float], sink: str) -> float:
+    return sum(value for cell, value in flows.items() if cell.endswith(f"_{sink}"))
+
+
+@pytest.mark.parametrize(
+    ("pv", "home", "car", "battery"),
+    [
+        (0.0, 400.0, 0.0, 0.0),
+        (5000.0, 400.0, 0.0, 0.0),
+        (5000.0, 400.0, 3000.0, -1000.0),
+        (1000.0, 600.0, 11000.0, 0.0),
+        (0.0, 800.0, 0.0, 1500.0),
+        (3000.0, 500.0, 0.0, -4000.0),
+        (200.0, 300.0, 2000.0, 2500.0),
+    ],
+)
+def test_allocate_flows_conserves_power(
+    pv: float, home: float, car: float, battery: float
+) -> None:
+    """Every source is fully allocated and every sink fully supplied."""
+    grid = home + car - pv - battery
+    flows = allocate_flows(pv, grid, battery, car)
+
+    assert set(flows) == set(FLOW_CELLS)
+    assert all(value >= 0 for value in flows.values())
+    assert _source(flows, "pv") == pytest.approx(pv)
+    assert _source(flows, "grid") == pytest.approx(max(0.0, grid))
+    assert _source(flows, "battery") == pytest.approx(max(0.0, battery))
+    assert _sink(flows, "grid") == pytest.approx(max(0.0, -grid))
+    assert _sink(flows, "battery") == pytest.approx(max(0.0, -battery))
+    assert _sink(flows, "car") == pytest.approx(car)
+    assert _sink(flows, "home") == pytest.approx(home)
+
+
+def test_allocate_flows_priorities() -> None:
+    """Export takes PV before battery, charging takes PV before grid."""
+    flows = allocate_flows(1000.0, -1500.0, 800.0)
+    assert flows["pv_grid"] == pytest.approx(1000.0)
+    assert flows["battery_grid"] == pytest.approx(500.0)
+    assert flows["battery_home"] == pytest.approx(300.0)
+
+    flows = allocate_flows(1000.0, 2000.0, -1500.0)
+    assert flows["pv_battery"] == pytest.approx(1000.0)
+    assert flows["grid_battery"] == pytest.approx(500.0)
+    assert flows["grid_home"] == pytest.approx(1500.0)
+
+
+def test_allocate_flows_clamps() -> None:
+    """Negative PV, missing inputs and excess car demand are clamped."""
+    flows = allocate_flows(-50.0, 300.0)
+    assert _source(flows, "pv") == 0
+    assert flows["grid_home"] == pytest.approx(300.0)
+
+    assert sum(allocate_flows(None, None, None, None).values()) == 0
+
+    # The car cannot draw more than the supply, nothing is left for the home
+    flows = allocate_flows(1000.0, 500.0, None, 4000.0)
+    assert _sink(flows, "car") == pytest.approx(1500.0)
+    assert _sink(flows, "home") == 0
+    assert flows["pv_car"] == pytest.approx(1000.0)
+
+
+def test_trapezoid() -> None:
+    """The energy is the mean power times the elapsed time."""
+    assert trapezoid(1000.0, 3000.0, 0.5) == pytest.approx(1000.0)
+    assert trapezoid(1000.0, 3000.0, 0.0) == 0
+    assert trapezoid(1000.0, 3000.0, -1.0) == 0
+
+
+def test_step() -> None:
+    """A held value counts until the next sample, which counts from there."""
+    assert trapezoid(1000.0, 3000.0, 0.5, step=True) == pytest.approx(500.0)
+    assert trapezoid(1000.0, 3000.0, 0.0, step=True) == 0
+
+
+def test_hourly_energies() -> None:
+    """Mean powers are integrated into the hour of each row."""
+    hour = 480_000
+    starts = [hour * 3600.0, hour * 3600.0 + 1800, (hour + 1) * 3600.0]
+    durations = [0.5, 0.5, 0.5]
+    columns = {
+        "grid_power": [1000.0, -2000.0, math.nan],
+        "pv_power": [0.0, 2400.0, 600.0],
+    }
+    hours = hourly_energies(
+        starts,
+        durations,
+        columns,
+        {
+            "grid_in_energy_daily": ("grid_power", 1),
+            "grid_out_energy_daily": ("grid_power", -1),
+            "pv_energy_daily": ("pv_power", 1),
+        },
+    )
+
+    assert hours[hour]["grid_in_energy_daily"] == pytest.approx(500.0)
+    assert hours[hour]["grid_out_energy_daily"] == pytest.approx(1000.0)
+    assert hours[hour]["pv_energy_daily"] == pytest.approx(1200.0)
+    assert hours[hour]["grid_home"] == pytest.approx(500.0)
+    assert hours[hour]["pv_grid"] == pytest.approx(1000.0)
+    assert hours[hour]["pv_home"] == pytest.approx(200.0)
+    # Without the grid balance only the power-only energies are integrated
+    assert hours[hour + 1] == {"pv_energy_daily": pytest.approx(300.0)}
+
+
+def test_flow_matrix_integrates_trapezoid() -> None:
+    """Cells are integrated between consecutive updates."""
+    matrix = FlowMatrix()
+    assert not matrix.integrate(allocate_flows(0.0, 1000.0), 0.0)
+    assert matrix.integrate(allocate_flows(0.0, 3000.0), 0.5)
+    assert matrix.energies == {"grid_home": pytest.approx(1000.0)}
+
+    restored = FlowMatrix({**matrix.energies, "unknown": 5.0})
+    assert restored.energies == matrix.energies
+
+
+def test_flow_matrix_integrates_steps() -> None:
+    """As steps, every update adds the flows held since the previous one."""
+    matrix = FlowMatrix()
+    matrix.integrate(allocate_flows(0.0, 1000.0), 0.0, step=True)
+    matrix.integrate(allocate_flows(0.0, 3000.0), 0.5, step=True)
+    matrix.integrate(allocate_flows(0.0, 3000.0), 0.5, step=True)
+    assert matrix.energies == {"grid_home": pytest.approx(2000.0)}
+
+
+def test_flow_ratios() -> None:
+    """Ratios are derived from the cells, battery energy with its PV share."""
+    matrix = FlowMatrix(
+        {
+            "pv_home": 2000.0,
+            "pv_battery": 3000.0,
+            "pv_grid": 1000.0,
+            "grid_battery": 1000.0,
+            "grid_home": 1000.0,
+            "battery_home": 1000.0,
+            "grid_car": 1000.0,
+        }
+    )
+    ratios = {key: derive(matrix) for key, derive in FLOW_RATIOS.items()}
+
+    assert ratios["battery_energy_mix"] == pytest.approx(0.75)
+    assert ratios["home_energy_mix"] == pytest.approx((2000 + 750) / 4000)
+    assert ratios["car_charging_energy_mix"] == 0
+    assert ratios["self_consumption"] == pytest.approx(5 / 6)
+    assert ratios["self_sufficiency"] == pytest.approx(1 - 2000 / 5000)
+
+    empty = FlowMatrix()
+    assert all(derive(empty) == 0 for derive in FLOW_RATIOS.values())
@@ -0,0 +1,99 @@
+"""Tests of the journal replay."""
+
+from pathlib import Path
+
+from custom_components.energy_stats.journal import (
+    encode_token,
+    read_lines,
+    remove_journal,
+    replay_lines,
+    rotated_path,
+)
+
+
+def test_torn_last_line_is_removed(tmp_path: Path) -> None:
+    """A line torn by a crash is dropped from the file and not replayed."""
+    path = tmp_path / "journal"
+    path.write_text("1 flows.pv_home=1.0\n2 flows.pv_home=2.5\n3 flows.pv_h")
+
+    lines = read_lines(path)
+
+    assert lines == ["1 flows.pv_home=1.0", "2 flows.pv_home=2.5"]
+    assert path.read_text() == "1 flows.pv_home=1.0\n2 flows.pv_home=2.5\n"
+    data: dict = {}
+    assert replay_lines(data, lines, 0) == (2, 2)
+    assert data == {"flows": {"pv_home": 2.5}}
+
+
+def test_missing_journal(tmp_path: Path) -> None:
+    """Without a journal file nothing is replayed."""
+    assert read_lines(tmp_path / "journal") == []
+
+
+def test_removed_keys_are_replayed() -> None:
+    """A removal clears the bucket before the values that follow it."""
+    data: dict = {"energy_sums": {"pv_energy_daily": 5.0}}
+    lines = [
+        "4 energy_sums.pv_energy_daily=6.0 energy_sums.home_energy_daily=2.0",
+        "5 -energy_sums energy_sums.home_energy_daily=0.5 last_reset=2025-01-01",
+    ]
+
+    assert replay_lines(data, lines, 3) == (5, 2)
+    assert data == {
+        "energy_sums": {"home_energy_daily": 0.5},
+        "last_reset": "2025-01-01",
+    }
+
+
+def test_lines_of_the_snapshot_and_unreadable_lines_are_skipped() -> None:
+    """Only newer lines apply, but every sequence number counts."""
+    data: dict = {"flows": {"pv_home": 1.0}}
+    lines = [
+        "2 flows.pv_home=0.5",
+        "garbage",
+        "3 flows.pv_home=",
+        "4 flows.pv_home=2.0",
+        "6 flows.pv_home",
+    ]
+
+    assert replay_lines(data, lines, 2) == (6, 1)
+    assert data == {"flows": {"pv_home": 2.0}}
+
+
+def test_encoded_values_are_replayed() -> None:
+    """Values of any JSON type survive a line, strings with spaces included."""
+    tokens = [
+        encode_token("flows", "pv_home", 1.25),
+        encode_token("last_reset", None, "2025-01-01T00:00:00+01:00"),
+        encode_token("meta", None, "car one"),
+        encode_token("sessions", "active", {"energy": 0.5, "name": "a b"}),
+    ]
+    data: dict = {}
+
+    assert replay_lines(data, [f"1 {' '.join(tokens)}"], 0) == (1, 1)
+    assert data == {
+        "flows": {"pv_home": 1.25},
+        "last_reset": "2025-01-01T00:00:00+01:00",
+        "meta": "car one",
+        "sessions": {"active": {"energy": 0.5, "name": "a b"}},
+    }
+
+
+def test_values_that_are_no_json_are_kept_raw() -> None:
+    """A value that is no JSON is kept instead of dropping the line."""
+    data: dict = {}
+
+    assert replay_lines(data, ["1 flows.pv_home=2.0 tariffs.peak=high"], 0) == (1, 1)
+    assert data == {"flows": {"pv_home": 2.0}, "tariffs": {"peak": "high"}}
+
+
+def test_journal_files_are_removed(tmp_path: Path) -> None:
+    """The current and a replaced journal file are both deleted."""
+    path = tmp_path / "journal"
+    path.write_text("2 flows.pv_home=1.0\n")
+    rotated_path(path).write_text("1 flows.pv_home=0.5\n")
+
+    remove_journal(path)
+    remove_journal(path)
+
+    assert list(tmp_path.iterdir()) == []
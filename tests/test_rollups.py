@@ -0,0 +1,114 @@
+"""Tests of the rollups and of the daily reset boundaries."""
+
+from datetime import UTC, date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from custom_components.energy_stats.rollups import (
+    RollupTree,
+    period_start,
+    reset_after,
+    reset_at,
+)
+
+BERLIN = ZoneInfo("Europe/Berlin")
+
+
+def test_hours_are_closed_from_the_running_totals() -> None:
+    """A new hour closes the previous one with the energy since its start."""
+    tree = RollupTree()
+    assert tree.update_hour(100, {"grid_in_energy": 1.0})
+    assert not tree.update_hour(100, {"grid_in_energy": 2.0})
+    assert tree.update_hour(101, {"grid_in_energy": 3.0})
+
+    assert tree.buckets["hour_100"] == {"grid_in_energy": 2.0}
+    assert tree.hours({"grid_in_energy": 5.0}) == {
+        100: {"grid_in_energy": 2.0},
+        101: {"grid_in_energy": 2.0},
+    }
+
+
+def test_days_fold_into_week_month_and_year() -> None:
+    """Finished days are added to their periods, finished months to the year."""
+    tree = RollupTree()
+    tree.start_day(date(2024, 12, 30))
+    tree.update_hour(10, {"pv_energy": 0.0})
+    tree.update_hour(11, {"pv_energy": 1.0})
+    tree.close_day(date(2024, 12, 30), {"pv_energy": 2.0}, date(2024, 12, 31))
+
+    assert not any(bucket.startswith("hour_") for bucket in tree.buckets)
+    assert tree.totals("month", {"pv_energy": 1.0}) == {"pv_energy": 3.0}
+    assert tree.totals("year", {"pv_energy": 1.0}) == {"pv_energy": 3.0}
+
+    tree.close_day(date(2024, 12, 31), {"pv_energy": 3.0}, date(2025, 1, 1))
+
+    assert tree.buckets["last_month"] == {"pv_energy": 5.0}
+    assert tree.buckets["last_year"] == {"pv_energy": 5.0}
+    assert tree.ids["year"] == 2025
+    assert tree.totals("year", {"pv_energy": 1.0}) == {"pv_energy": 1.0}
+    # 2024-12-30 is a Monday, the week continues into the new year
+    assert tree.totals("week", {"pv_energy": 1.0}) == {"pv_energy": 6.0}
+
+    tree.close_day(date(2025, 1, 31), {"pv_energy": 4.0}, date(2025, 2, 1))
+
+    assert tree.buckets["last_month"] == {"pv_energy": 4.0}
+    assert tree.totals("year", {}) == {"pv_energy": 4.0}
+
+
+def test_tree_is_persisted_as_flat_dict() -> None:
+    """The persisted form restores the same buckets and ids."""
+    tree = RollupTree()
+    tree.start_day(date(2025, 3, 14))
+    tree.update_hour(20, {"home_energy": 1.5})
+    tree.close_day(date(2025, 3, 14), {"home_energy": 7.0}, date(2025, 3, 15))
+
+    restored = RollupTree(tree.as_dict())
+    # Empty buckets have no keys to persist
+    assert restored.buckets == {
+        bucket: sums for bucket, sums in tree.buckets.items() if sums
+    }
+    assert restored.ids == tree.ids
+
+
+@pytest.mark.parametrize(
+    ("day", "reset", "expected"),
+    [
+        # Standard and summer time
+        (date(2025, 1, 15), time(0, 0), datetime(2025, 1, 14, 23, 0, tzinfo=UTC)),
+        (date(2025, 7, 15), time(0, 0), datetime(2025, 7, 14, 22, 0, tzinfo=UTC)),
+        # 02:30 is skipped in spring, the reset moves an hour later
+        (date(2025, 3, 30), time(2, 30), datetime(2025, 3, 30, 1, 30, tzinfo=UTC)),
+        # 02:30 repeats in autumn, the reset happens at the first one
+        (date(2025, 10, 26), time(2, 30), datetime(2025, 10, 26, 0, 30, tzinfo=UTC)),
+    ],
+)
+def test_reset_at(day: date, reset: time, expected: datetime) -> None:
+    """Resets keep their local time across DST changes."""
+    assert reset_at(day, reset, BERLIN) == expected
+
+
+def test_days_across_dst_have_23_and_25_hours() -> None:
+    """The periods of the days with a DST change are shorter or longer."""
+    midnight = time(0, 0)
+    spring = reset_after(datetime(2025, 3, 30, 12, tzinfo=UTC), midnight, BERLIN)
+    assert spring - period_start(spring - timedelta(seconds=1), midnight, BERLIN) == (
+        timedelta(hours=23)
+    )
+    autumn = reset_after(datetime(2025, 10, 26, 12, tzinfo=UTC), midnight, BERLIN)
+    assert autumn - period_start(autumn - timedelta(seconds=1), midnight, BERLIN) == (
+        timedelta(hours=25)
+    )
+
+
+def test_period_boundaries() -> None:
+    """A reset starts its period and the next reset is strictly later."""
+    reset = time(6, 0)
+    boundary = datetime(2025, 5, 2, 4, 0, tzinfo=UTC)
+
+    assert period_start(boundary, reset, BERLIN) == boundary
+    assert period_start(boundary - timedelta(seconds=1), reset, BERLIN) == (
+        boundary - timedelta(days=1)
+    )
+    assert reset_after(boundary, reset, BERLIN) == boundary + timedelta(days=1)
+    assert reset_after(boundary - timedelta(seconds=1), reset, BERLIN) == boundary
@@ -0,0 +1,25 @@
+"""Tests of the persistence of the tariff costs."""
+
+from custom_components.energy_stats.tariffs import TariffCosts
+
+
+def test_points_within_one_second_are_persisted() -> None:
+    """Points are kept with their exact start, even in the same second."""
+    costs = TariffCosts()
+    costs.observe({"import_price": 0.30}, 1000.2)
+    costs.observe({"import_price": 0.35}, 1000.7)
+    costs.costs["grid_in_cost"] = 1.5
+
+    restored = TariffCosts(costs.as_dict())
+
+    assert restored.curves["import"].points() == [(1000.2, 0.30), (1000.7, 0.35)]
+    assert restored.curves["export"].points() == []
+    assert restored.costs == {"grid_in_cost": 1.5}
+
+
+def test_points_stored_per_start_are_loaded() -> None:
+    """Points stored as <tariff>:<start> keys are still read."""
+    restored = TariffCosts({"cost:home_cost": 0.2, "import:1000": 0.3})
+
+    assert restored.curves["import"].points() == [(1000.0, 0.3)]
+    assert restored.costs == {"home_cost": 0.2}